@@ -0,0 +1,190 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_panel
+from main import filtered_growth, omega, real_consumption, unfiltering
+from scripts.data_loading import align_inputs
+from scripts.fama_macbeth import stage_one_fama_macbeth, stage_two_fama_macbeth
+from scripts.pruning import pruning_path
+from scripts.ransac_attempt import apply_ransac
+
+BENCHMARKS = ('unfiltering', 'stage_one', 'stage_two', 'pruning_path', 'apply_ransac')
+PRESETS = {
+    'quick': {'years': [100, 500], 'assets': [100, 1000, 5000]},
+    'full': {'years': [100, 1000], 'assets': [1000, 10000, 50000]},
+}
+# thresholds of the masked (unbalanced-panel) stages used for panels with missing histories
+MIN_OBS = 10
+MIN_ASSETS = 2
+
+
+def prepare_inputs(n_years: int, n_assets: int, nan_fraction: float, seed) -> dict:
+    """
+    Runs the pipeline up to stage one on a synthetic panel and collects the inputs of every benchmark.
+
+    With a non-zero nan_fraction both stages run in their masked (unbalanced-panel) mode, so the
+    late-listed assets and their missing returns reach stage two and the pruning path.
+    """
+    load = align_inputs(synthetic_panel(n_years, n_assets, nan_fraction, seed))
+    ctx = {'omega': omega}
+    df_filtered = filtered_growth(ctx, real_consumption(ctx, load))
+    df_solution = unfiltering(ctx, df_filtered)
+    df_assets = load.test_assets
+    masked = nan_fraction > 0
+
+    # the first three unfiltered growth rates are NaN; assets and NIPA data cover the same years
+    factor = df_solution['unfiltered_growth_rate']
+    min_obs = MIN_OBS if masked else None
+    _, betas = stage_one_fama_macbeth(factor, df_assets, 3, 3, min_obs=min_obs)
+    # stage two and pruning run on the assets that passed stage one, like prune_extremes passes them on
+    df_priced = df_assets[[df_assets.columns[0], *betas.index]]
+    return {
+        'df_filtered': df_filtered,
+        'factor': factor,
+        'df_assets': df_assets,
+        'df_priced': df_priced,
+        'betas': betas,
+        'avg_returns': np.nanmean(df_priced.iloc[:, 1:].to_numpy(), axis=0),
+        'min_obs': min_obs,
+        'min_assets': MIN_ASSETS if masked else None,
+    }
+
+
+def benchmark_functions(inputs: dict, save_dir: str) -> dict:
+    """Zero-argument callables of the hot paths, by benchmark name."""
+    return {
+        'unfiltering': lambda: unfiltering({'omega': omega}, inputs['df_filtered']),
+        'stage_one': lambda: stage_one_fama_macbeth(inputs['factor'], inputs['df_assets'], 3, 3,
+                                                    min_obs=inputs['min_obs']),
+        'stage_two': lambda: stage_two_fama_macbeth(inputs['df_priced'], inputs['betas'],
+                                                    min_assets=inputs['min_assets']),
+        # pruning_path skips the periods with a missing return among the remaining assets
+        'pruning_path': lambda: pruning_path(inputs['betas'], inputs['df_priced'], max_n=3),
+        'apply_ransac': lambda: apply_ransac(inputs['betas'].to_numpy(), inputs['avg_returns'],
+                                             'benchmark_RANSAC.png', save_dir=save_dir),
+    }
+
+
+def measure(func, repeat: int) -> dict:
+    """
+    Wall and CPU times of repeat calls, and the peak traced memory of one extra call.
+
+    The memory run is separate because tracemalloc slows down allocations.
+    """
+    wall_times = []
+    cpu_times = []
+    for _ in range(repeat):
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        func()
+        wall_times.append(time.perf_counter() - wall_start)
+        cpu_times.append(time.process_time() - cpu_start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'wall_times': wall_times,
+        'wall_min': min(wall_times),
+        'wall_median': statistics.median(wall_times),
+        'cpu_median': statistics.median(cpu_times),
+        'peak_bytes': peak,
+    }
+
+
+def metadata(args) -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'arguments': vars(args),
+    }
+
+
+def compare(results: list, baseline_path: str):
+    """Prints the ratios of median wall time and peak memory to a previous result file."""
+    with open(baseline_path) as f:
+        baseline = {(r['benchmark'], r['n_years'], r['n_assets'], r['nan_fraction']): r for r in json.load(f)['results']}
+    print(f"\nCompared to {baseline_path} (ratio > 1 is slower / larger):")
+    for r in results:
+        old = baseline.get((r['benchmark'], r['n_years'], r['n_assets'], r['nan_fraction']))
+        if old is not None:
+            print(f"{r['benchmark']:>14} T={r['n_years']:<6} N={r['n_assets']:<7} "
+                  f"time x{r['wall_median'] / old['wall_median']:.2f}  memory x{r['peak_bytes'] / max(old['peak_bytes'], 1):.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of the asset-pricing hot paths on synthetic panels")
+    parser.add_argument('--preset', choices=list(PRESETS), default='quick', help="default grid of scales")
+    parser.add_argument('--years', type=int, nargs='+', help="numbers of years T (overrides the preset)")
+    parser.add_argument('--assets', type=int, nargs='+', help="numbers of test assets N (overrides the preset)")
+    parser.add_argument('--nan-fraction', type=float, default=0.0, help="share of assets with a missing history")
+    parser.add_argument('--benchmarks', nargs='+', choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument('--repeat', type=int, default=3, help="timed calls per benchmark and scale")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None,
+                        help="result file, default benchmarks/results/<commit>.json")
+    parser.add_argument('--compare', default=None, metavar='BASELINE', help="previous result file to compare with")
+    args = parser.parse_args(argv)
+
+    # figures of apply_ransac are drawn off-screen
+    import matplotlib
+    matplotlib.use('Agg')
+
+    years = args.years or PRESETS[args.preset]['years']
+    assets = args.assets or PRESETS[args.preset]['assets']
+    info = metadata(args)
+
+    results = []
+    with tempfile.TemporaryDirectory() as save_dir:
+        for n_years in years:
+            for n_assets in assets:
+                inputs = prepare_inputs(n_years, n_assets, args.nan_fraction, args.seed)
+                functions = benchmark_functions(inputs, save_dir)
+                for name in args.benchmarks:
+                    result = {
+                        'benchmark': name,
+                        'n_years': n_years,
+                        'n_assets': n_assets,
+                        'nan_fraction': args.nan_fraction,
+                        **measure(functions[name], args.repeat),
+                    }
+                    results.append(result)
+                    print(f"{name:>14} T={n_years:<6} N={n_assets:<7} {result['wall_median'] * 1e3:10.2f} ms "
+                          f"{result['peak_bytes'] / 2 ** 20:10.2f} MiB")
+
+    output = args.output or os.path.join('benchmarks', 'results', f"{(info['commit'] or 'local')[:12]}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({'metadata': info, 'results': results}, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+    return results
+
+
+if __name__ == "__main__":
+    main()
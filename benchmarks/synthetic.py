@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+
+def synthetic_nipa(n_years: int, start_year: int = 1929, seed=0):
+    """
+    Synthetic consumption, population and price index tables in the layout of the CSVs in data/.
+
+    Real consumption per capita follows a random walk in logs with a drift of 2% per year,
+    population grows by about 1% per year and both price indices by about 3% per year. Nominal
+    consumption (in millions) is split into non-durables and services.
+
+    Args:
+        n_years (int): Number of years T.
+        start_year (int): First year.
+        seed: Seed or np.random.Generator.
+
+    Returns:
+        df_consumption (pd.DataFrame): Columns 'year', 'nondurables', 'services'.
+        df_population (pd.DataFrame): Columns 'year', 'pop' (integer, in thousands).
+        df_price_index (pd.DataFrame): Columns 'year', 'prc_index_nondurables', 'prc_index_services'.
+    """
+    rng = np.random.default_rng(seed)
+    years = np.arange(start_year, start_year + n_years)
+
+    consumption_per_capita = 550 * np.exp(np.cumsum(rng.normal(0.02, 0.02, n_years)))
+    pop = np.round(120000 * np.exp(np.cumsum(rng.normal(0.01, 0.003, n_years)))).astype(np.int64)
+    prc_index = 10 * np.exp(np.cumsum(rng.normal(0.03, 0.02, (n_years, 2)), axis=0))
+    share_nondurables = np.clip(0.5 + np.cumsum(rng.normal(0, 0.005, n_years)), 0.1, 0.9)
+
+    # inverse of Task 2: real consumption per capita -> nominal consumption in millions
+    total_real_consumption = consumption_per_capita * pop * (10 ** 3) / (10 ** 6)
+    df_consumption = pd.DataFrame({
+        'year': years,
+        'nondurables': share_nondurables * total_real_consumption * prc_index[:, 0],
+        'services': (1 - share_nondurables) * total_real_consumption * prc_index[:, 1],
+    })
+    df_population = pd.DataFrame({'year': years, 'pop': pop})
+    df_price_index = pd.DataFrame({
+        'year': years,
+        'prc_index_nondurables': prc_index[:, 0],
+        'prc_index_services': prc_index[:, 1],
+    })
+    return df_consumption, df_population, df_price_index
+
+
+def synthetic_test_assets(years, factor, n_assets: int, nan_fraction: float = 0.0, seed=0) -> pd.DataFrame:
+    """
+    Synthetic test asset returns (in percent) driven by a single factor.
+
+    Returns follow rₜᵢ = aᵢ + bᵢ fₜ + εₜᵢ with betas and noise of the magnitude of the 25
+    Fama-French portfolios against consumption growth. NaNs in the factor are treated as zero.
+
+    Args:
+        years (array-like): Periods, written to the first column.
+        factor (array-like): Factor series fₜ of the same length as years.
+        n_assets (int): Number of assets N.
+        nan_fraction (float): Share of assets with a missing history: these assets start
+                              (are listed) at a random later period, their earlier returns are NaN.
+        seed: Seed or np.random.Generator.
+
+    Returns:
+        pd.DataFrame: First column 'year', followed by one return column per asset.
+    """
+    rng = np.random.default_rng(seed)
+    years = np.asarray(years)
+    f = np.nan_to_num(np.asarray(factor, dtype=float))
+    n_years = len(years)
+
+    alphas = rng.normal(10, 3, n_assets)
+    betas = rng.normal(100, 80, n_assets)
+    R = alphas + np.outer(f, betas) + rng.normal(0, 20, (n_years, n_assets))
+
+    n_missing = int(round(nan_fraction * n_assets))
+    if n_missing:
+        assets = rng.choice(n_assets, n_missing, replace=False)
+        listing = rng.integers(1, n_years, n_missing)
+        R[:, assets] = np.where(np.arange(n_years)[:, None] < listing, np.nan, R[:, assets])
+
+    names = [f'asset_{i}' for i in range(n_assets)]
+    return pd.concat([pd.DataFrame({'year': years}), pd.DataFrame(R, columns=names)], axis=1)
+
+
+def synthetic_panel(n_years: int, n_assets: int, nan_fraction: float = 0.0, seed=0) -> dict:
+    """
+    The four input tables of main.py for T years and N assets.
+
+    The test assets load on the filtered consumption growth rate of the synthetic NIPA data
+    and cover the same years, so stage one is aligned with startIdx_asset == startIdx_risk_factor.
+
+    Returns:
+        dict with the entries 'consumption', 'population', 'price_index' and 'test_assets'
+        (the keys of main.INPUT_FILES).
+    """
+    rng = np.random.default_rng(seed)
+    df_consumption, df_population, df_price_index = synthetic_nipa(n_years, seed=rng)
+    consumption_per_capita = (df_consumption['nondurables'] / df_price_index['prc_index_nondurables'] +
+                              df_consumption['services'] / df_price_index['prc_index_services']) / df_population['pop']
+    growth = np.log(consumption_per_capita / consumption_per_capita.shift(1))
+    df_test_assets = synthetic_test_assets(df_consumption['year'], growth, n_assets, nan_fraction, seed=rng)
+    return {
+        'consumption': df_consumption,
+        'population': df_population,
+        'price_index': df_price_index,
+        'test_assets': df_test_assets,
+    }
@@ -1,196 +1,427 @@
+import argparse
+import os
+
 import numpy as np
 import pandas as pd
 
-import scripts.helper
+from scripts import instrumentation
+from scripts.cache import StageCache
+from scripts.data_loading import NIPA_TABLES, load_inputs
 from scripts.fama_macbeth import stage_one_fama_macbeth, stage_two_fama_macbeth
-from scripts.plotting import plot_second_stage_result_from_values
-from scripts.pruning_animated import generate_pruning_animation
-from scripts.ransac_attempt import apply_ransac
-
-# read csv-data and collect them in dataframes
-df_consumption = pd.read_csv('data/Nondurables_Services_Consumption.csv')  # consumption data
-df_population = pd.read_csv('data/Population.csv')                         # population data
-df_price_index = pd.read_csv('data/price_index.csv')                       # price index
-df_test_assets = pd.read_csv('data/test_assets.csv')
-
-#############################################################################
-# Task 2: Calculate yearly (filtered) consumption per capita price adjusted #
-#############################################################################
-
-# check if years match
-assert (df_consumption['year'].values == df_population['year'].values).all()
-# calculate price adjusted non-durables and services
-df_real_consumption = df_consumption.copy()
-df_real_consumption['nondurables'] = df_consumption['nondurables'] / df_price_index['prc_index_nondurables']
-df_real_consumption['services'] = df_consumption['services'] / df_price_index['prc_index_services']
-
-# calculated real total consumption of each year
-df_real_consumption['total_real_consumption'] = df_real_consumption['nondurables'] + df_real_consumption['services']
-
-# merge total consumption and population of a given year
-df_solution = df_real_consumption[['year', 'total_real_consumption']].merge(df_population, on='year')
-# calculate per capita real consumption
-# adjust population by multiplying with 1000 and adjust total_consumption by 1Mio
-# This step is optional since units cancel out upon division
-df_solution['total_real_consumption_per_capita'] = (
-        df_solution['total_real_consumption'] * (10 ** 6) / (df_solution['pop'] * (10 ** 3))
-)
-# calculate the growth rate (using log differences of consecutive years)
-# we shift the data to ensure that we divide by the previous year
-# this results in the growth rate of the first year to be NaN
-df_solution['filtered_growth_rate'] = np.log(
-    (df_solution['total_real_consumption_per_capita'] /
-     df_solution['total_real_consumption_per_capita'].shift(1))
-)
-# the average growth rate, ignoring the NaN entries
-average_growth_rate = df_solution['filtered_growth_rate'].mean(skipna=True)
-
-###############################################################################
-# Task 3: Calculate yearly (unfiltered) consumption per capita price adjusted #
-###############################################################################
+from scripts.pipeline import Pipeline
+from scripts.pruning import prune_extremes, pruning_path
+from scripts.pruning_animated import pruning_animation_frames
+from scripts.rendering import figure_spec, render_figures
+from scripts.robust_line import ransac_line
+from scripts.unfiltering import unfilter_log_consumption
+from scripts.universes import evaluate_universes
+
+# input files, relative to the data directory
+INPUT_FILES = {
+    'consumption': 'Nondurables_Services_Consumption.csv',  # consumption data
+    'population': 'Population.csv',                         # population data
+    'price_index': 'price_index.csv',                       # price index
+    'test_assets': 'test_assets.csv',                       # test asset returns
+}
 
 # Omega is the filter parameter as specified in the course material/paper
 omega = 0.46
-# Function to compute the unfiltered log-level of consumption for each row
-def unfiltering(df):
+# number of extreme betas dropped on each side in the outlier pruning
+pruning_n = 3
+# residual threshold of the RANSAC fit
+ransac_threshold = 2
+
+# source modules of the cached stages and artifacts; editing one of them invalidates the cached results
+NUMERIC_CODE = ('main', 'scripts.data_loading', 'scripts.unfiltering', 'scripts.fama_macbeth', 'scripts.inference')
+ARTIFACT_CODE = NUMERIC_CODE + ('scripts.pruning', 'scripts.pruning_animated', 'scripts.robust_line',
+                                'scripts.rendering', 'scripts.plotting', 'scripts.ransac_attempt')
+
+
+# name of the reference universe (the test assets of the data directory) in the universe comparison
+REFERENCE_UNIVERSE = 'test_assets'
+
+
+def input_paths(ctx, names=None):
+    return [os.path.join(ctx['data_dir'], INPUT_FILES[name]) for name in (names or INPUT_FILES)]
+
+
+def universe_sources(specs):
     """
-    Reconstructs the unfiltered log consumption level (ŷₜ) from filtered growth data,
-    using the formula:  ŷₜ = [ĉₜ − (1 − Ω) * Δĉₜ₋₁] / Ω
-    Args:
-        df (pd.Series): A row of the DataFrame, including 'total_consumption_per_capita'
-                        and a lagged value of the filtered growth rate.
-    Returns:
-        float: Unfiltered log consumption level at time t.
+    Maps the --universes entries [NAME=]CSV to {name: path}; the name defaults to the file name.
+
+    Raises:
+        ValueError: If a name is used twice or is the name of the reference universe.
     """
-    return (np.log(df['total_real_consumption_per_capita']) - (1 - omega) * df['growth_rate_shifted']) / omega
-
-
-# Shift the filtered growth rate by one period to obtain the c_{t-1}
-df_solution['growth_rate_shifted'] = df_solution['filtered_growth_rate'].shift(1)
-# Apply the unfiltering formula row-wise to compute the unfiltered log consumption level
-df_solution['unfiltered_log_consumption_level'] = df_solution.apply(unfiltering, axis=1)
-# Drop the temporary shifted column as it's no longer needed
-df_solution.drop('growth_rate_shifted', axis=1, inplace=True)
-# Compute the growth rate of the unfiltered log consumption level
-df_solution['unfiltered_growth_rate'] = (
-        df_solution['unfiltered_log_consumption_level'] -
-        df_solution['unfiltered_log_consumption_level'].shift(1)
-)
-# Optional: Inspect the filtered vs. reconstructed unfiltered growth rates
-print()
-print(df_solution[['year', 'filtered_growth_rate', 'unfiltered_growth_rate']].head(8))
-print()
-df_solution.to_csv('results/solution_consumption.csv', index=False)
+    universes = {}
+    for spec in specs:
+        name, path = spec.split('=', 1) if '=' in spec else (os.path.splitext(os.path.basename(spec))[0], spec)
+        if name == REFERENCE_UNIVERSE:
+            raise ValueError(f"universe name {name!r} of {path} is reserved for the reference test assets, "
+                             f"pass NAME={path}")
+        if name in universes:
+            raise ValueError(f"universe name {name!r} is used for both {universes[name]} and {path}, "
+                             f"pass NAME={path}")
+        universes[name] = path
+    return universes
+
+
+##################################################################################
+##################################### Stages #####################################
+##################################################################################
+# Every stage is called as stage(ctx, **results_of_its_dependencies). Stages are module level
+# functions, so the pipeline can also run them on a process pool.
+
+def cached_stage(ctx, stage, compute, **params):
+    # the consumption series only depend on the NIPA files, the code and their parameters;
+    # without a cache in ctx (e.g. benchmarks, tests) they are computed directly
+    cache = ctx.get('cache')
+    if cache is None:
+        return compute()
+    key = cache.key(stage, input_paths(ctx, NIPA_TABLES), code=NUMERIC_CODE, **params)
+    return cache.cached(key, compute)
+
+
+def load(ctx):
+    # read the input tables with explicit dtypes and align the NIPA series on their common years
+    return load_inputs(dict(zip(INPUT_FILES, input_paths(ctx))), cache=ctx['cache'])
+
+
+def real_consumption(ctx, load):
+    #############################################################################
+    # Task 2: Calculate yearly (filtered) consumption per capita price adjusted #
+    #############################################################################
+    def compute():
+        # all series are aligned on the same years by the loader
+        # calculate price adjusted non-durables and services
+        real_nondurables = load.nondurables / load.prc_index_nondurables
+        real_services = load.services / load.prc_index_services
+
+        # calculated real total consumption of each year, next to the population of that year
+        df_solution = pd.DataFrame({
+            'year': load.years,
+            'total_real_consumption': real_nondurables + real_services,
+            'pop': load.pop,
+        })
+        # calculate per capita real consumption
+        # adjust population by multiplying with 1000 and adjust total_consumption by 1Mio
+        # This step is optional since units cancel out upon division
+        df_solution['total_real_consumption_per_capita'] = (
+                df_solution['total_real_consumption'] * (10 ** 6) / (df_solution['pop'] * (10 ** 3))
+        )
+        return df_solution
+
+    return cached_stage(ctx, 'real_consumption', compute)
+
+
+def filtered_growth(ctx, real_consumption):
+    def compute():
+        df_solution = real_consumption.copy()
+        # calculate the growth rate (using log differences of consecutive years)
+        # we shift the data to ensure that we divide by the previous year
+        # this results in the growth rate of the first year to be NaN
+        df_solution['filtered_growth_rate'] = np.log(
+            (df_solution['total_real_consumption_per_capita'] /
+             df_solution['total_real_consumption_per_capita'].shift(1))
+        )
+        return df_solution
+
+    return cached_stage(ctx, 'filtered_growth', compute)
+
+
+def unfiltering(ctx, filtered_growth):
+    ###############################################################################
+    # Task 3: Calculate yearly (unfiltered) consumption per capita price adjusted #
+    ###############################################################################
+    def compute():
+        df_solution = filtered_growth.copy()
+        # Compute the unfiltered log-level of consumption for all rows at once using
+        #   ŷₜ = [ĉₜ − (1 − Ω) * Δĉₜ₋₁] / Ω
+        # and the growth rate of the unfiltered log consumption level
+        log_level, growth_rate = unfilter_log_consumption(
+            df_solution['total_real_consumption_per_capita'],
+            df_solution['filtered_growth_rate'],
+            ctx['omega']
+        )
+        df_solution['unfiltered_log_consumption_level'] = log_level
+        df_solution['unfiltered_growth_rate'] = growth_rate
+        return df_solution
+
+    return cached_stage(ctx, 'unfiltering', compute, omega=ctx['omega'])
+
 
 ####################################################################################################
 # Task 5: Calculate and compare fama and macbeth by using filtered and unfiltered consumption data #
 ####################################################################################################
 
-# first stage fama and mcbeth with filtered NIPA data
-fil_alpha_values, fil_beta_values = stage_one_fama_macbeth(
-    df_solution['filtered_growth_rate'],
-    df_test_assets,
-    3,
-    1)
+def run_fama_macbeth(ctx, df_solution, df_test_assets, growth_column, startIdx_asset, startIdx_risk_factor):
+    def compute():
+        # first stage fama and mcbeth
+        alpha_values, beta_values = stage_one_fama_macbeth(
+            df_solution[growth_column],
+            df_test_assets,
+            startIdx_asset,
+            startIdx_risk_factor)
+        # second stage fama and mcbeth
+        exposure, lambda0 = stage_two_fama_macbeth(df_test_assets, beta_values)
+        return alpha_values, beta_values, exposure, lambda0
 
-# second stage fama and mcbeth with filtered NIPA data
-fil_exposure, fil_lambda0 = stage_two_fama_macbeth(df_test_assets,fil_beta_values)
+    cache = ctx['cache']
+    key = cache.key('fama_macbeth', input_paths(ctx), code=NUMERIC_CODE, omega=ctx['omega'],
+                    growth_column=growth_column, offsets=(startIdx_asset, startIdx_risk_factor))
+    return cache.cached(key, compute)
 
 
-# first stage fama and mcbeth with unfiltered NIPA data
-unfil_alpha_values, unfil_beta_values = stage_one_fama_macbeth(
-    df_solution['unfiltered_growth_rate'],
-    df_test_assets,
-    5,
-    3)
+def fama_macbeth_filtered(ctx, load, filtered_growth):
+    # fama and mcbeth with filtered NIPA data
+    # the filtered growth rate starts in the second NIPA year; the offsets pair it with the returns of the same year
+    return run_fama_macbeth(ctx, filtered_growth, load.test_assets, 'filtered_growth_rate',
+                            *load.fama_macbeth_offsets(1))
 
-# second stage fama and mcbeth with unfiltered NIPA data
 
-unfil_exposure, unfil_lambda0 = stage_two_fama_macbeth(df_test_assets, unfil_beta_values)
+def fama_macbeth_unfiltered(ctx, load, unfiltering):
+    # fama and mcbeth with unfiltered NIPA data
+    # the unfiltered growth rate starts in the fourth NIPA year
+    return run_fama_macbeth(ctx, unfiltering, load.test_assets, 'unfiltered_growth_rate',
+                            *load.fama_macbeth_offsets(3))
+
 
-###################################################################################
-######################### Optional: visualize the results:#########################
-###################################################################################
-print("\n### RESULTS ###")
-print("Filtered Consumption Data:")
-print("Price of Risk (slope/lambda):")
-print(fil_exposure)
-print("Return Unexplained by Factor Model (Intercept):")
-print(fil_lambda0)
-print("\nUnfiltered Consumption Data:")
-print("Price of Risk (slope/lambda):")
-print(unfil_exposure)
-print("Return Unexplained by Factor Model (Intercept):")
-print(unfil_lambda0)
-print()
-# filtered
-plot_second_stage_result_from_values(
-    fil_beta_values,
-    df_test_assets,
-    fil_exposure,
-    fil_lambda0,
-    "filtered"
-)
-# unfiltered
-plot_second_stage_result_from_values(
-    unfil_beta_values,
-    df_test_assets,
-    unfil_exposure,
-    unfil_lambda0,
-    "unfiltered"
-)
-print()
 ###################################################################################
 ################################### Optional 2: ###################################
 ###################################################################################
 
-# it seems outlier skew the line (high lambda_0)
-# idea, drop n largest and smallest value
-
-# find n smallest and n_largest
-def prune_n_from_betas_and_assets(betas:pd.Series, assets:pd.DataFrame, n):
-    sorted_beta = unfil_beta_values.copy(deep=True).to_numpy()
-    sorted_beta.sort()
-    n_smallest = sorted_beta[:n]
-    n_largest = sorted_beta[-n:]
-    # get assets names corresponding to of n_smallest and n_largest
-    smallest_assets = scripts.helper.get_elements_of_series(unfil_beta_values, n_smallest)
-    largest_assets = scripts.helper.get_elements_of_series(unfil_beta_values, n_largest)
-
-    pruned_beta_values = unfil_beta_values.copy(deep=True)
-    scripts.helper.delete_elements_from_series(pruned_beta_values, smallest_assets, inplace=True)
-    scripts.helper.delete_elements_from_series(pruned_beta_values, largest_assets, inplace=True)
-
-    pruned_test_assets = df_test_assets.copy(deep=True)
-    scripts.helper.delete_columns_from_dataframe(pruned_test_assets, smallest_assets, inplace=True)
-    scripts.helper.delete_columns_from_dataframe(pruned_test_assets, largest_assets, inplace=True)
-    return pruned_beta_values, pruned_test_assets
-
-pruned_betas_list = []
-pruned_assets_list = []
-for i in range(1,4):
-    b, a = prune_n_from_betas_and_assets(unfil_beta_values, df_test_assets, i)
-    pruned_betas_list.append(b)
-    pruned_assets_list.append(a)
-
-pruned_exposure, pruned_lambda0 = stage_two_fama_macbeth(pruned_assets_list[2], pruned_betas_list[2])
-generate_pruning_animation(pruned_betas_list, pruned_assets_list)
-
-plot_second_stage_result_from_values(
-    pruned_betas_list[2],
-    pruned_assets_list[2],
-    pruned_exposure,
-    pruned_lambda0,
-    "unfiltered_outlier_pruning"
-)
+def pruning(ctx, load, fama_macbeth_unfiltered):
+    # it seems outlier skew the line (high lambda_0)
+    # idea, drop n largest and smallest value
+    df_test_assets = load.test_assets
+    unfil_beta_values = fama_macbeth_unfiltered[1]
+    n = ctx['pruning_n']
+
+    # sort the betas once and compute stage two for every pruning depth up to pruning_n
+    pruning_results = pruning_path(unfil_beta_values, df_test_assets, max_n=n)
+
+    pruned_betas_list = []
+    pruned_assets_list = []
+    for i in range(1, n + 1):
+        b, a = prune_extremes(unfil_beta_values, df_test_assets, i)
+        pruned_betas_list.append(b)
+        pruned_assets_list.append(a)
+    return pruning_results, pruned_betas_list, pruned_assets_list
+
 
 ##################################################################################
 ################################### Optional 3:###################################
 ##################################################################################
-# A more sophisticated approach to outlier reduction is RANSAC
-avg_returns = df_test_assets.iloc[:, 1:].mean()
-asset_names = avg_returns.index
 
-x = unfil_beta_values[asset_names].values
-y = avg_returns.values
-apply_ransac(x, y, "outlier_removal_RANSAC")
\ No newline at end of file
+def ransac(ctx, load, fama_macbeth_unfiltered):
+    # A more sophisticated approach to outlier reduction is RANSAC
+    avg_returns = load.test_assets.iloc[:, 1:].mean()
+    asset_names = avg_returns.index
+
+    x = fama_macbeth_unfiltered[1][asset_names].values
+    y = avg_returns.values
+    return x, y, ransac_line(x, y, ctx['ransac_threshold'])
+
+
+def universes(ctx, unfiltering):
+    # price further test-asset universes against the same filtered and unfiltered consumption growth
+    if not ctx['universes']:
+        return None
+    factors = unfiltering.set_index('year')[['filtered_growth_rate', 'unfiltered_growth_rate']]
+    factors.columns = ['filtered', 'unfiltered']
+    universe_paths = {REFERENCE_UNIVERSE: input_paths(ctx, ['test_assets'])[0], **ctx['universes']}
+    return evaluate_universes(factors, universe_paths, max_workers=ctx['universe_workers'])
+
+
+###################################################################################
+######################### Optional: visualize the results:#########################
+###################################################################################
+
+def artifacts(ctx, load, unfiltering, fama_macbeth_filtered, fama_macbeth_unfiltered, pruning, ransac):
+    cache = ctx['cache']
+    results_dir = ctx['results_dir']
+    df_test_assets = load.test_assets
+    os.makedirs(results_dir, exist_ok=True)
+    # figures are collected as plain data specs and rendered at the end, off the numeric critical path
+    pending_figures = []
+
+    def artifact_key(stage, **params):
+        return cache.key(stage, input_paths(ctx), code=ARTIFACT_CODE, omega=ctx['omega'], **params)
+
+    def request_figure(name, stage, spec, **params):
+        """Queues a figure spec for rendering unless the file is up to date for the current inputs and params."""
+        if not ctx['plots']:
+            return
+        path = os.path.join(results_dir, name)
+        key = artifact_key(stage, **params)
+        if cache.artifact_is_current(path, key):
+            print(f"Up to date: {path}")
+            return
+        pending_figures.append((path, key, spec))
+
+    path = os.path.join(results_dir, 'solution_consumption.csv')
+    key = artifact_key('solution_csv')
+    if cache.artifact_is_current(path, key):
+        print(f"Up to date: {path}")
+    else:
+        unfiltering.to_csv(path, index=False)
+        cache.mark_artifact(path, key)
+
+    for label, (_, beta_values, exposure, lambda0) in (('filtered', fama_macbeth_filtered),
+                                                        ('unfiltered', fama_macbeth_unfiltered)):
+        request_figure(f'{label}_second_stage.png', 'second_stage_plot',
+                       figure_spec('second_stage',
+                                   betas=beta_values,
+                                   df_assets=df_test_assets,
+                                   slope=exposure,
+                                   intercept=lambda0,
+                                   model_label=label,
+                                   save_dir=results_dir),
+                       model_label=label)
+
+    pruning_results, pruned_betas_list, pruned_assets_list = pruning
+    # the animation frames reuse the regression results of the pruning path
+    request_figure('regression_pruning.gif', 'pruning_animation',
+                   figure_spec('pruning_animation',
+                               frames=pruning_animation_frames(
+                                   pruned_betas_list,
+                                   pruned_assets_list,
+                                   pruning_results['lambda'].iloc[1:],
+                                   pruning_results['lambda0'].iloc[1:]),
+                               filename=os.path.join(results_dir, 'regression_pruning.gif')),
+                   pruning_n=ctx['pruning_n'])
+
+    pruned_exposure, pruned_lambda0 = pruning_results.loc[ctx['pruning_n'], ['lambda', 'lambda0']]
+    request_figure('unfiltered_outlier_pruning_second_stage.png', 'pruning_plot',
+                   figure_spec('second_stage',
+                               betas=pruned_betas_list[-1],
+                               df_assets=pruned_assets_list[-1],
+                               slope=pruned_exposure,
+                               intercept=pruned_lambda0,
+                               model_label="unfiltered_outlier_pruning",
+                               save_dir=results_dir),
+                   pruning_n=ctx['pruning_n'])
+
+    x, y, ransac_fit = ransac
+    request_figure('outlier_removal_RANSAC.png', 'ransac_plot',
+                   figure_spec('ransac',
+                               x=x,
+                               y=y,
+                               inlier_mask=ransac_fit['inlier_mask'],
+                               slope=ransac_fit['slope'],
+                               intercept=ransac_fit['intercept'],
+                               name="outlier_removal_RANSAC",
+                               save_dir=results_dir),
+                   residual_threshold=ctx['ransac_threshold'], method='ransac_line')
+
+    if pending_figures:
+        render_figures([spec for _, _, spec in pending_figures], max_workers=ctx['plot_workers'])
+        for path, key, _ in pending_figures:
+            cache.mark_artifact(path, key)
+    return [path for path, _, _ in pending_figures]
+
+
+def build_pipeline() -> Pipeline:
+    pipeline = Pipeline()
+    pipeline.add('load', load)
+    pipeline.add('real_consumption', real_consumption, deps=['load'])
+    pipeline.add('filtered_growth', filtered_growth, deps=['real_consumption'])
+    pipeline.add('unfiltering', unfiltering, deps=['filtered_growth'])
+    pipeline.add('fama_macbeth_filtered', fama_macbeth_filtered, deps=['load', 'filtered_growth'])
+    pipeline.add('fama_macbeth_unfiltered', fama_macbeth_unfiltered, deps=['load', 'unfiltering'])
+    pipeline.add('pruning', pruning, deps=['load', 'fama_macbeth_unfiltered'])
+    pipeline.add('ransac', ransac, deps=['load', 'fama_macbeth_unfiltered'])
+    pipeline.add('artifacts', artifacts, deps=['load', 'unfiltering', 'fama_macbeth_filtered',
+                                               'fama_macbeth_unfiltered', 'pruning', 'ransac'])
+    pipeline.add('universes', universes, deps=['unfiltering'])
+    return pipeline
+
+
+def print_results(results, ctx):
+    if 'unfiltering' in results:
+        # Optional: Inspect the filtered vs. reconstructed unfiltered growth rates
+        print()
+        print(results['unfiltering'][['year', 'filtered_growth_rate', 'unfiltered_growth_rate']].head(8))
+        print()
+    if 'fama_macbeth_filtered' in results or 'fama_macbeth_unfiltered' in results:
+        print("\n### RESULTS ###")
+    for label, stage in (("Filtered", 'fama_macbeth_filtered'), ("\nUnfiltered", 'fama_macbeth_unfiltered')):
+        if stage in results:
+            _, _, exposure, lambda0 = results[stage]
+            print(f"{label} Consumption Data:")
+            print("Price of Risk (slope/lambda):")
+            print(exposure)
+            print("Return Unexplained by Factor Model (Intercept):")
+            print(lambda0)
+    if 'pruning' in results:
+        pruning_results = results['pruning'][0]
+        print(f"\nOutlier pruning (n = {pruning_results.index[-1]}): slope {pruning_results['lambda'].iloc[-1]:.6f}, "
+              f"intercept {pruning_results['lambda0'].iloc[-1]:.6f}")
+    if 'ransac' in results:
+        ransac_fit = results['ransac'][2]
+        print("\nRANSAC (residual threshold {}): slope {:.6f}, intercept {:.6f}, {} inliers".format(
+            ctx['ransac_threshold'], ransac_fit['slope'], ransac_fit['intercept'], ransac_fit['n_inliers']))
+    if results.get('universes') is not None:
+        print("\n### TEST ASSET UNIVERSES ###")
+        print(results['universes'].to_string(float_format=lambda v: f"{v:.6f}"))
+
+
+def main(argv=None):
+    pipeline = build_pipeline()
+    parser = argparse.ArgumentParser(description="Fama-MacBeth with filtered and unfiltered NIPA consumption data")
+    parser.add_argument('--stages', nargs='+', choices=list(pipeline.stages), default=None, metavar='STAGE',
+                        help="stages to run (with their dependencies), default all: " + ", ".join(pipeline.stages))
+    parser.add_argument('--executor', choices=['thread', 'process'], default='thread',
+                        help="pool running independent stages concurrently")
+    parser.add_argument('--workers', type=int, default=None, help="size of the stage pool")
+    parser.add_argument('--data-dir', default='data', help="directory of the input csv files")
+    parser.add_argument('--results-dir', default='results', help="directory of the written artifacts")
+    parser.add_argument('--no-cache', action='store_true', help="recompute every stage and rewrite every artifact")
+    parser.add_argument('--no-plots', action='store_true', help="only compute the numbers, render no figures")
+    parser.add_argument('--plot-workers', type=int, default=None, help="number of processes rendering figures")
+    parser.add_argument('--universes', nargs='+', default=[], metavar='[NAME=]CSV',
+                        help="further test asset universes priced against the same consumption factors")
+    parser.add_argument('--universe-workers', type=int, default=None, help="number of processes pricing universes")
+    parser.add_argument('--profile', action='store_true',
+                        help="record wall time, CPU time and calls per stage and hot function, print a summary")
+    parser.add_argument('--profile-memory', action='store_true', help="also record tracemalloc peaks (slower)")
+    parser.add_argument('--trace', default=None, metavar='FILE',
+                        help="write the recorded spans as a Chrome trace (chrome://tracing, Perfetto)")
+    args = parser.parse_args(argv)
+    try:
+        universe_paths = universe_sources(args.universes)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.profile or args.profile_memory or args.trace:
+        instrumentation.enable(trace_memory=args.profile_memory)
+
+    ctx = {
+        # stages and artifacts are only recomputed if their input files or parameters changed
+        'cache': StageCache('.cache', enabled=not args.no_cache),
+        'data_dir': args.data_dir,
+        'results_dir': args.results_dir,
+        'omega': omega,
+        'pruning_n': pruning_n,
+        'ransac_threshold': ransac_threshold,
+        'plots': not args.no_plots,
+        'plot_workers': args.plot_workers,
+        'universes': universe_paths,
+        'universe_workers': args.universe_workers,
+    }
+    results = pipeline.run(ctx, targets=args.stages, max_workers=args.workers, executor=args.executor)
+    print_results(results, ctx)
+
+    recorder = instrumentation.disable()
+    if recorder is not None:
+        print("\n### PROFILE ###")
+        if args.executor == 'process':
+            print("(stages run on the process pool are not recorded, use --executor thread)")
+        print(recorder.summary().to_string(float_format=lambda v: f"{v:.4f}"))
+        if args.trace:
+            recorder.write_chrome_trace(args.trace)
+            print(f"Trace written to {args.trace}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
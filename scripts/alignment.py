@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+
+from scripts.fama_macbeth import batched_cross_sectional_ols
+
+
+def build_lagged_design(factor_years, factor_values, target_years, lags, horizons):
+    """
+    Builds every shifted and cumulated version of a factor series on a common year grid.
+
+    Entry (l, h, t) holds the factor cumulated over horizons[h] years, starting lags[l] years
+    after target year t:  fₜ = Σ_{k=0}^{H-1} gₜ₊ₗ₊ₖ.  A positive lag lets consumption lead the
+    returns (e.g. Parker-Julliard ultimate consumption risk), a negative lag lets it trail them.
+    All combinations are differences of one cumulative sum, so no DataFrame is re-sliced.
+
+    Args:
+        factor_years (array-like): Integer years of the factor series.
+        factor_values (array-like): Factor values (e.g. consumption growth); NaN marks missing years.
+        target_years (array-like): Integer years of the asset returns the factor is aligned to.
+        lags (array-like): Lead/lag offsets in years.
+        horizons (array-like): Cumulation horizons in years (>= 1).
+
+    Returns:
+        np.ndarray: Design array of shape (len(lags), len(horizons), len(target_years)).
+            Entries whose window leaves the factor sample or contains a missing year are NaN.
+    """
+    factor_years = np.asarray(factor_years, dtype=np.int64)
+    factor_values = np.asarray(factor_values, dtype=float)
+    target_years = np.asarray(target_years, dtype=np.int64)
+    lags = np.asarray(lags, dtype=np.int64)
+    horizons = np.asarray(horizons, dtype=np.int64)
+    assert np.all(horizons >= 1), "Horizons must be at least one year"
+
+    # dense year grid covering every window that can be requested
+    first_year = min(factor_years.min(), target_years.min() + lags.min())
+    last_year = max(factor_years.max(), target_years.max() + lags.max() + horizons.max())
+    grid = np.full(last_year - first_year + 1, np.nan)
+    grid[factor_years - first_year] = factor_values
+
+    missing = np.isnan(grid)
+    csum = np.concatenate(([0.0], np.cumsum(np.where(missing, 0.0, grid))))
+    cmissing = np.concatenate(([0], np.cumsum(missing)))
+
+    # window [t + lag, t + lag + horizon) expressed as positions on the grid
+    start = (target_years - first_year)[None, None, :] + lags[:, None, None]
+    end = start + horizons[None, :, None]
+    design = csum[end] - csum[start]
+    design[cmissing[end] - cmissing[start] > 0] = np.nan
+    return design
+
+
+def alignment_search(factor_years,
+                     factor_values,
+                     df_assets: pd.DataFrame,
+                     lags=range(-3, 4),
+                     horizons=range(1, 13),
+                     min_obs: int = 10):
+    """
+    Compares pricing performance across all lead/lag alignments and cumulation horizons.
+
+    Replaces the hardcoded start offsets of stage_one_fama_macbeth (e.g. 3/1 for filtered and
+    5/3 for unfiltered data, which both align returns and consumption of the same calendar
+    year) by a search over (lag, horizon). All stage-one regressions run as one batch of
+    masked sums over the lagged design; stage two prices the average returns of the complete
+    periods, as in stage_two_fama_macbeth.
+
+    Args:
+        factor_years (array-like): Integer years of the factor series (e.g. df_solution['year']).
+        factor_values (array-like): Factor values (e.g. df_solution['unfiltered_growth_rate']).
+        df_assets (pd.DataFrame): Asset returns; the first column holds the years.
+        lags (array-like): Lead/lag offsets in years; lag 0 is the contemporaneous alignment.
+        horizons (array-like): Cumulation horizons in years.
+        min_obs (int): Minimum number of aligned years; combinations with fewer yield NaN.
+
+    Returns:
+        pd.DataFrame: One row per (lag, horizon) with the columns 'lag', 'horizon', 'n_obs',
+                      'start_year', 'end_year', 'lambda', 'lambda0' and 'r2'.
+
+    Notes:
+        - Assets with missing returns in any year are skipped.
+    """
+    lags = np.asarray(lags, dtype=np.int64)
+    horizons = np.asarray(horizons, dtype=np.int64)
+    years = df_assets.iloc[:, 0].to_numpy(dtype=np.int64)
+    returns = df_assets.iloc[:, 1:].to_numpy(dtype=float)
+    returns = returns[:, ~np.isnan(returns).any(axis=0)]
+
+    design = build_lagged_design(factor_years, factor_values, years, lags, horizons)
+    X = design.reshape(-1, len(years))  # (C, T), one row per (lag, horizon)
+    mask = ~np.isnan(X)
+
+    # centering keeps the masked cross-products numerically stable
+    Y = returns - returns.mean(axis=0)
+    n_obs = mask.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_mean = np.nanmean(X, axis=1)
+    Xc = np.where(mask, X - x_mean[:, None], 0.0)
+    W = mask.astype(float)
+
+    # masked sums for all combinations and assets at once
+    sx = Xc.sum(axis=1)
+    sxx = np.einsum('ct,ct->c', Xc, Xc)
+    sy = W @ Y
+    sxy = Xc @ Y
+    with np.errstate(invalid='ignore', divide='ignore'):
+        betas = (n_obs[:, None] * sxy - sx[:, None] * sy) / (n_obs * sxx - sx ** 2)[:, None]
+    betas[n_obs < max(min_obs, 3)] = np.nan
+
+    avg_returns = returns.mean(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        lambda_mean, lambda0_mean, r2 = batched_cross_sectional_ols(betas, avg_returns)
+
+    combos = np.stack(np.meshgrid(lags, horizons, indexing='ij'), axis=-1).reshape(-1, 2)
+    first = np.where(mask.any(axis=1), years[mask.argmax(axis=1)], -1)
+    last = np.where(mask.any(axis=1), years[len(years) - 1 - mask[:, ::-1].argmax(axis=1)], -1)
+    return pd.DataFrame({
+        'lag': combos[:, 0],
+        'horizon': combos[:, 1],
+        'n_obs': n_obs,
+        'start_year': first,
+        'end_year': last,
+        'lambda': lambda_mean,
+        'lambda0': lambda0_mean,
+        'r2': r2,
+    })
@@ -0,0 +1,139 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+from scripts.fama_macbeth import batched_cross_sectional_ols, batched_time_series_ols
+
+
+def moving_block_indices(rng: np.random.Generator, n_obs: int, block_length: int, n_samples: int) -> np.ndarray:
+    """
+    Draws moving-block bootstrap index arrays in bulk.
+
+    Each resample concatenates randomly placed blocks of consecutive periods, which keeps the
+    serial correlation of consumption growth within a block intact.
+
+    Args:
+        rng (np.random.Generator): Random number generator.
+        n_obs (int): Number of periods in the sample.
+        block_length (int): Number of consecutive periods per block.
+        n_samples (int): Number of resamples.
+
+    Returns:
+        np.ndarray: Integer array of shape (n_samples, n_obs) with the resampled period positions.
+    """
+    n_blocks = -(-n_obs // block_length)
+    starts = rng.integers(0, n_obs - block_length + 1, size=(n_samples, n_blocks))
+    idx = (starts[:, :, None] + np.arange(block_length)).reshape(n_samples, -1)
+    return idx[:, :n_obs]
+
+
+def _evaluate(x: np.ndarray, Y: np.ndarray, idx: np.ndarray) -> np.ndarray:
+    # both stages for every row of idx; returns (n_samples, 2) with columns lambda, lambda0
+    _, betas = batched_time_series_ols(x[idx], Y[idx])
+    lambda_mean, lambda0_mean, _ = batched_cross_sectional_ols(betas, Y[idx].mean(axis=1))
+    return np.column_stack((lambda_mean, lambda0_mean))
+
+
+def _bootstrap_batch(args):
+    x, Y, seed_sequence, n_samples, block_length = args
+    rng = np.random.default_rng(seed_sequence)
+    return _evaluate(x, Y, moving_block_indices(rng, len(x), block_length, n_samples))
+
+
+def block_bootstrap_fama_macbeth(df_risk_factor: pd.DataFrame,
+                                 df_assets: pd.DataFrame,
+                                 startIdx_asset,
+                                 startIdx_risk_factor,
+                                 n_boot: int = 10000,
+                                 block_length: int = None,
+                                 confidence: float = 0.95,
+                                 batch_size: int = 500,
+                                 seed: int = 42,
+                                 max_workers: int = None,
+                                 parallel_threshold: int = 5000):
+    """
+    Moving-block bootstrap confidence intervals for lambda and lambda0.
+
+    Every resample draws blocks of years jointly for the risk factor and the asset returns and
+    re-estimates both Fama-MacBeth stages. Resamples are evaluated in vectorized batches; each
+    batch gets its own child of one SeedSequence, so the draws do not depend on how the batches
+    are spread over the process pool.
+
+    Args:
+        df_risk_factor (pd.DataFrame): Risk factor time series, aligned as in stage_one_fama_macbeth.
+        df_assets (pd.DataFrame): Asset returns; the first column holds the period labels.
+        startIdx_asset (int): Starting index to slice asset return time series for alignment.
+        startIdx_risk_factor (int): Starting index to slice risk factor time series for alignment.
+        n_boot (int): Number of bootstrap resamples.
+        block_length (int): Number of consecutive years per block. Defaults to T^(1/3), rounded up.
+        confidence (float): Coverage of the confidence intervals.
+        batch_size (int): Number of resamples evaluated per vectorized batch.
+        seed (int): Seed of the root SeedSequence.
+        max_workers (int): Number of worker processes. Default uses all CPUs.
+        parallel_threshold (int): Minimum number of resamples for which the process pool is used.
+                                  A resample of the 25 test assets over ~95 years costs ~30 µs, the
+                                  pool start-up ~60 ms, so with 4 workers the pool pays off from
+                                  about 3,000 resamples.
+
+    Returns:
+        dict with the entries
+            'estimate': pd.Series — lambda and lambda0 on the aligned sample
+            'distribution': pd.DataFrame — bootstrap draws (columns 'lambda', 'lambda0')
+            'intervals': pd.DataFrame — rows 'lambda'/'lambda0'; percentile and BCa bounds
+
+    Notes:
+        - Both stages use the aligned stage-one window, so the estimate can differ slightly from
+          stage_two_fama_macbeth, which averages over the full return sample.
+        - Assets with missing values in the stage-one window are skipped.
+    """
+    asset_names = df_assets.columns[1:]
+    Y = df_assets[asset_names].to_numpy(dtype=float)[startIdx_asset:]
+    x = np.asarray(df_risk_factor.values, dtype=float).reshape(-1)[startIdx_risk_factor:]
+    assert len(x) == len(Y), f"Length mismatch: {len(x)} vs {len(Y)}"
+    assert not np.isnan(x).any(), "The risk factor must not contain NaNs after slicing"
+    Y = Y[:, ~np.isnan(Y).any(axis=0)]
+
+    n_obs = len(x)
+    if block_length is None:
+        block_length = int(np.ceil(n_obs ** (1 / 3)))
+
+    estimate = _evaluate(x, Y, np.arange(n_obs)[None, :])[0]
+
+    batch_sizes = [min(batch_size, n_boot - i) for i in range(0, n_boot, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(batch_sizes))
+    tasks = [(x, Y, s, b, block_length) for s, b in zip(seeds, batch_sizes)]
+    max_workers = max_workers or os.cpu_count()
+    if n_boot >= parallel_threshold and len(tasks) > 1 and max_workers > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            draws = np.concatenate(list(pool.map(_bootstrap_batch, tasks)))
+    else:
+        draws = np.concatenate([_bootstrap_batch(task) for task in tasks])
+
+    # jackknife (leave one year out) for the BCa acceleration
+    keep = ~np.eye(n_obs, dtype=bool)
+    jackknife = _evaluate(x, Y, np.broadcast_to(np.arange(n_obs), (n_obs, n_obs))[keep].reshape(n_obs, -1))
+
+    tail = (1 - confidence) / 2
+    percentile = np.quantile(draws, [tail, 1 - tail], axis=0)
+
+    z0 = norm.ppf(np.mean(draws < estimate, axis=0))
+    jack_dev = jackknife.mean(axis=0) - jackknife
+    acceleration = np.sum(jack_dev ** 3, axis=0) / (6 * np.sum(jack_dev ** 2, axis=0) ** 1.5)
+    z = norm.ppf([tail, 1 - tail])[:, None]
+    adjusted = norm.cdf(z0 + (z0 + z) / (1 - acceleration * (z0 + z)))
+    bca = np.array([[np.quantile(draws[:, k], adjusted[j, k]) for k in range(2)] for j in range(2)])
+
+    columns = ['lambda', 'lambda0']
+    return {
+        'estimate': pd.Series(estimate, index=columns),
+        'distribution': pd.DataFrame(draws, columns=columns),
+        'intervals': pd.DataFrame({
+            'percentile_low': percentile[0],
+            'percentile_high': percentile[1],
+            'bca_low': bca[0],
+            'bca_high': bca[1],
+        }, index=columns),
+    }
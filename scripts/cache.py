@@ -0,0 +1,176 @@
+import hashlib
+import importlib.util
+import json
+import os
+import pickle
+import threading
+import zlib
+
+from scripts.instrumentation import instrumented
+
+
+class StageCache:
+    """
+    Content-addressed memoization of pipeline stages and result artifacts.
+
+    A stage is identified by its name, the SHA-256 digests of its input files and of the source
+    modules that compute it, and its parameters (e.g. omega, start offsets, pruning depth, RANSAC
+    threshold), so editing the code invalidates its cached results. Stage outputs are
+    stored as compressed pickles in cache_dir; the least recently used entries are evicted once
+    the directory exceeds max_bytes. Artifacts such as CSVs and figures are tracked in an index,
+    so they are only rewritten when their key or the file on disk changed.
+
+    Stages running concurrently on a thread pool share one instance: stores and evictions are
+    serialized by a lock, and an entry removed by another thread or process reads as a miss.
+    """
+
+    INDEX_FILE = 'artifacts.json'
+
+    def __init__(self, cache_dir: str = '.cache', max_bytes: int = 256 * 2 ** 20, enabled: bool = True):
+        """
+        Args:
+            cache_dir (str): Directory holding the cached entries and the artifact index.
+            max_bytes (int): Upper bound for the total size of the cached entries.
+            enabled (bool): If False, every stage is recomputed and every artifact rewritten.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._file_digests = {}
+        self._lock = threading.Lock()
+        if enabled:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def __getstate__(self):
+        # the lock cannot be pickled for stages on a process pool; each process gets its own
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def file_digest(self, path: str) -> str:
+        """SHA-256 of a file's content, memoized per (path, size, mtime) within the process."""
+        stat = os.stat(path)
+        memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        if memo_key not in self._file_digests:
+            digest = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(2 ** 20), b''):
+                    digest.update(block)
+            self._file_digests[memo_key] = digest.hexdigest()
+        return self._file_digests[memo_key]
+
+    def key(self, stage: str, files=(), code=(), **params) -> str:
+        """
+        Content address of a stage: hash of its name, input file digests, source digests and parameters.
+
+        Args:
+            stage (str): Stage name.
+            files (iterable): Paths of the input files.
+            code (iterable): Names of the modules computing the stage, e.g. 'scripts.fama_macbeth'.
+                             Their source files are hashed without importing them.
+            **params: Parameters of the stage; hashed by their repr.
+        """
+        digest = hashlib.sha256(stage.encode())
+        for path in files:
+            digest.update(self.file_digest(path).encode())
+        for module in code:
+            digest.update(f'{module}:{self.file_digest(importlib.util.find_spec(module).origin)};'.encode())
+        for name in sorted(params):
+            digest.update(f'{name}={params[name]!r};'.encode())
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f'{key}.pkl.z')
+
+    @instrumented
+    def load(self, key: str):
+        """
+        Returns:
+            hit (bool): Whether an entry for key exists.
+            value: The cached value, or None on a miss.
+        """
+        if not self.enabled:
+            return False, None
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.loads(zlib.decompress(f.read()))
+            # refresh the access time used for LRU eviction
+            os.utime(path)
+        except FileNotFoundError:
+            # missing, or evicted concurrently
+            return False, None
+        return True, value
+
+    @instrumented
+    def store(self, key: str, value):
+        if not self.enabled:
+            return
+        path = self._entry_path(key)
+        data = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), 1)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with self._lock:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._evict()
+
+    def cached(self, key: str, compute):
+        """
+        Returns the cached value for key, calling compute() and storing its result on a miss.
+        """
+        hit, value = self.load(key)
+        if not hit:
+            value = compute()
+            self.store(key, value)
+        return value
+
+    def _evict(self):
+        # called with the lock held; other processes may still remove entries in between
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.pkl.z'):
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        # drop least recently used entries first
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _read_index(self) -> dict:
+        path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def artifact_is_current(self, path: str, key: str) -> bool:
+        """True if path was written for key and has not been modified since."""
+        if not self.enabled or not os.path.exists(path):
+            return False
+        record = self._read_index().get(os.path.abspath(path))
+        return record is not None and record['key'] == key and record['digest'] == self.file_digest(path)
+
+    def mark_artifact(self, path: str, key: str):
+        """Records that path has been written for key."""
+        if not self.enabled:
+            return
+        index = self._read_index()
+        index[os.path.abspath(path)] = {'key': key, 'digest': self.file_digest(path)}
+        tmp_path = os.path.join(self.cache_dir, f'{self.INDEX_FILE}.{os.getpid()}.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f, indent=1)
+        os.replace(tmp_path, os.path.join(self.cache_dir, self.INDEX_FILE))
@@ -0,0 +1,183 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from scripts.instrumentation import instrumented
+
+# expected columns and dtypes of the inputs; the test assets have a period column followed by
+# any number of float64 return columns
+SCHEMAS = {
+    'consumption': {'year': 'int64', 'nondurables': 'float64', 'services': 'float64'},
+    'population': {'year': 'int64', 'pop': 'int64'},
+    'price_index': {'year': 'int64', 'prc_index_nondurables': 'float64', 'prc_index_services': 'float64'},
+    'test_assets': None,
+}
+NIPA_TABLES = ('consumption', 'population', 'price_index')
+
+
+class SchemaError(ValueError):
+    """An input table does not have the expected columns, dtypes or period index."""
+
+
+def _clean_column(name) -> str:
+    # a BOM survives in the first header if a file is read with the wrong encoding
+    return str(name).lstrip('\ufeff').strip()
+
+
+@instrumented
+def read_table(path: str, table: str) -> pd.DataFrame:
+    """
+    Reads and validates one input table from CSV, Parquet or Arrow/Feather.
+
+    CSVs are decoded as utf-8-sig, so a leading BOM does not end up in the first column name,
+    and parsed with explicit dtypes instead of type inference.
+
+    Args:
+        path (str): File path; the format follows the extension (.csv, .parquet/.pq, .feather/.arrow).
+        table (str): Key of SCHEMAS, e.g. 'consumption' or 'test_assets'.
+
+    Returns:
+        pd.DataFrame: The validated table, see validate_table.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        header = [_clean_column(c) for c in pd.read_csv(path, nrows=0, encoding='utf-8-sig').columns]
+        # integer columns are parsed as float first, so that a malformed entry fails validation, not parsing
+        dtypes = {name: 'float64' for name in header}
+        df = pd.read_csv(path, encoding='utf-8-sig', header=0, names=header, dtype=dtypes)
+    elif extension in ('.parquet', '.pq'):
+        df = pd.read_parquet(path)
+    elif extension in ('.feather', '.arrow'):
+        df = pd.read_feather(path)
+    else:
+        raise ValueError(f"Unsupported input format {extension!r} of {path}")
+    return validate_table(df, table, source=path)
+
+
+def validate_table(df: pd.DataFrame, table: str, source: str = None) -> pd.DataFrame:
+    """
+    Checks an input table against its schema and casts it to the schema dtypes.
+
+    The first column of the test assets (unnamed in the CSV) is renamed to 'year'.
+
+    Raises:
+        SchemaError: If columns are missing, values cannot be represented in the schema dtype
+                     (e.g. a non-integral year or population) or the years are not strictly increasing.
+    """
+    where = f"{table} ({source})" if source else table
+    df = df.rename(columns=_clean_column)
+    schema = SCHEMAS[table]
+    if schema is None:
+        df = df.rename(columns={df.columns[0]: 'year'})
+        schema = {'year': 'int64', **{name: 'float64' for name in df.columns[1:]}}
+    missing = [name for name in schema if name not in df.columns]
+    if missing:
+        raise SchemaError(f"{where}: missing columns {missing}, found {list(df.columns)}")
+
+    columns = {}
+    for name, dtype in schema.items():
+        values = df[name].to_numpy()
+        if dtype == 'int64':
+            as_float = values.astype('float64')
+            if np.isnan(as_float).any() or (as_float != np.round(as_float)).any():
+                raise SchemaError(f"{where}: column {name!r} must hold integers")
+            values = values.astype('int64', copy=False)
+        else:
+            values = values.astype(dtype, copy=False)
+        columns[name] = values
+    years = columns['year']
+    if len(years) > 1 and not (np.diff(years) > 0).all():
+        raise SchemaError(f"{where}: years must be unique and increasing")
+    return pd.DataFrame(columns)
+
+
+def _year_positions(years: np.ndarray, common: np.ndarray):
+    # positions of the common years in a sorted year array: a slice (view) if they are consecutive
+    start = int(np.searchsorted(years, common[0])) if len(common) else 0
+    stop = start + len(common)
+    if stop <= len(years) and np.array_equal(years[start:stop], common):
+        return slice(start, stop)
+    return np.searchsorted(years, common)
+
+
+class InputData:
+    """
+    The NIPA series aligned on a shared integer year index, plus the test asset returns.
+
+    Attributes:
+        years (np.ndarray): Years covered by all three NIPA tables, int64.
+        nondurables, services, prc_index_nondurables, prc_index_services, pop (np.ndarray):
+            NIPA columns over years. They are views of the parsed columns whenever a table's
+            years are consecutive around the common range, otherwise aligned copies.
+        test_assets (pd.DataFrame): Asset returns; first column 'year', one float64 column per asset.
+    """
+
+    def __init__(self, tables: dict):
+        """
+        Args:
+            tables (dict): Validated tables keyed like SCHEMAS (see read_table/validate_table).
+        """
+        year_arrays = [tables[name]['year'].to_numpy() for name in NIPA_TABLES]
+        common = year_arrays[0]
+        for years in year_arrays[1:]:
+            common = np.intersect1d(common, years, assume_unique=True)
+        self.years = common
+
+        for name, years in zip(NIPA_TABLES, year_arrays):
+            rows = _year_positions(years, common)
+            for column in list(SCHEMAS[name])[1:]:
+                setattr(self, column, tables[name][column].to_numpy()[rows])
+        self.test_assets = tables['test_assets']
+
+    def asset_offset(self) -> int:
+        """
+        Row of the test assets holding the first NIPA year (the start offset of the assets).
+
+        Raises:
+            SchemaError: If the test assets from this row on do not cover exactly the NIPA years,
+                         i.e. a factor built from the NIPA series would be paired with the wrong returns.
+        """
+        asset_years = self.test_assets['year'].to_numpy()
+        offset = int(np.searchsorted(asset_years, self.years[0]))
+        if not np.array_equal(asset_years[offset:], self.years):
+            covered = asset_years[offset:]
+            found = f"{covered[0]}..{covered[-1]}" if len(covered) else "none"
+            raise SchemaError(f"test_assets: years from row {offset} ({found}) do not match "
+                              f"the NIPA years {self.years[0]}..{self.years[-1]}")
+        return offset
+
+    def fama_macbeth_offsets(self, first_factor_row: int):
+        """
+        Start offsets (startIdx_asset, startIdx_risk_factor) of stage one for a factor on the NIPA years.
+
+        Args:
+            first_factor_row (int): First row of the factor series without NaN, e.g. 1 for the
+                                    filtered and 3 for the unfiltered growth rate.
+        """
+        return self.asset_offset() + first_factor_row, first_factor_row
+
+
+def align_inputs(frames: dict) -> InputData:
+    """Validates in-memory tables (e.g. synthetic data) and aligns them like load_inputs."""
+    return InputData({name: validate_table(frames[name], name) for name in SCHEMAS})
+
+
+def load_inputs(paths: dict, cache=None) -> InputData:
+    """
+    Reads, validates and aligns the four input tables.
+
+    Args:
+        paths (dict): File path per key of SCHEMAS.
+        cache (StageCache): If given, every parsed table is kept in its cached binary form,
+                            keyed by the content of its file, so unchanged files are not parsed again.
+    """
+    tables = {}
+    for name in SCHEMAS:
+        path = paths[name]
+        if cache is None:
+            tables[name] = read_table(path, name)
+        else:
+            tables[name] = cache.cached(cache.key('read_table', [path], code=[__name__], table=name),
+                                        lambda path=path, name=name: read_table(path, name))
+    return InputData(tables)
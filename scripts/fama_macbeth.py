@@ -1,89 +1,517 @@
 import numpy as np
 import pandas as pd
-from scipy.stats import linregress
 
+from scripts.inference import hac_regression_se, newey_west_lag, newey_west_se, shanken_se
+from scripts.instrumentation import instrumented
 
+
+def _time_series_ols(x: np.ndarray, Y: np.ndarray):
+    """
+    Closed-form OLS of every column of Y on the single regressor x (with intercept).
+
+    All N regressions share the same x, so its mean and sum of squared deviations are
+    computed once and the slopes of all assets follow from a single matrix-vector product.
+
+    Args:
+        x (np.ndarray): Regressor of shape (T,), free of NaNs.
+        Y (np.ndarray): Dependent variables of shape (T, N), free of NaNs.
+
+    Returns:
+        alpha (np.ndarray): Intercepts, shape (N,).
+        beta (np.ndarray): Slopes, shape (N,).
+        resid_var (np.ndarray): Residual variances with T - 2 degrees of freedom, shape (N,).
+        alpha_se (np.ndarray): Standard errors of the intercepts, shape (N,).
+        beta_se (np.ndarray): Standard errors of the slopes, shape (N,).
+    """
+    n_obs = x.shape[0]
+    x_mean = x.mean()
+    x_dev = x - x_mean
+    sxx = x_dev @ x_dev
+
+    # x_dev sums to zero, hence Y does not need to be demeaned for the cross-products
+    beta = (x_dev @ Y) / sxx
+    alpha = Y.mean(axis=0) - beta * x_mean
+
+    resid = Y - alpha - np.outer(x, beta)
+    resid_var = np.einsum('ij,ij->j', resid, resid) / (n_obs - 2)
+    beta_se = np.sqrt(resid_var / sxx)
+    alpha_se = np.sqrt(resid_var * (1 / n_obs + x_mean ** 2 / sxx))
+
+    return alpha, beta, resid_var, alpha_se, beta_se
+
+
+def _masked_time_series_ols(x: np.ndarray, Y: np.ndarray, mask: np.ndarray):
+    """
+    Like _time_series_ols, but every column of Y is regressed over its own valid periods only.
+
+    The per-asset sums over the valid observations are masked matrix products, so an unbalanced
+    panel is still handled without a loop over assets.
+
+    Args:
+        x (np.ndarray): Regressor of shape (T,); may contain NaNs outside the mask.
+        Y (np.ndarray): Dependent variables of shape (T, N); may contain NaNs outside the mask.
+        mask (np.ndarray): Boolean (T, N), True where both x and the return are observed.
+                           Every column needs at least three valid periods.
+
+    Returns:
+        The same arrays as _time_series_ols.
+    """
+    w = mask.astype(float)
+    n_obs = w.sum(axis=0)
+
+    # centering on the overall factor mean and the per-asset return means keeps the sums stable
+    x_center = np.nanmean(x[mask.any(axis=1)])
+    x0 = np.nan_to_num(x - x_center)
+    y_center = np.where(mask, Y, 0.0).sum(axis=0) / n_obs
+    Y0 = np.where(mask, Y - y_center, 0.0)
+
+    sx = x0 @ w
+    sxx = (x0 ** 2) @ w
+    sy = Y0.sum(axis=0)
+    sxy = x0 @ Y0
+    x_mean = sx / n_obs
+    sxx_dev = sxx - sx * x_mean
+    beta = (sxy - sx * sy / n_obs) / sxx_dev
+    alpha = y_center + sy / n_obs - beta * (x_mean + x_center)
+
+    resid = np.where(mask, Y - alpha - np.outer(np.nan_to_num(x), beta), 0.0)
+    resid_var = np.einsum('ij,ij->j', resid, resid) / (n_obs - 2)
+    beta_se = np.sqrt(resid_var / sxx_dev)
+    alpha_se = np.sqrt(resid_var * (1 / n_obs + (x_mean + x_center) ** 2 / sxx_dev))
+
+    return alpha, beta, resid_var, alpha_se, beta_se
+
+
+@instrumented
 def stage_one_fama_macbeth(df_risk_factor: pd.DataFrame,
                            df_assets: pd.DataFrame,
                            startIdx_asset,
-                           startIdx_risk_factor):
+                           startIdx_risk_factor,
+                           return_stats: bool = False,
+                           hac_lags: int = None,
+                           min_obs: int = None):
     """
     Performs the first stage of the Fama-MacBeth two-stage regression procedure.
 
     We estimate time-series regressions of individual asset returns on a single risk factor.
     It returns the estimated slope coefficients (betas) and intercepts (alphas) for each asset.
+    All assets are regressed at once with NumPy matrix operations instead of one regression per asset.
 
     Args:
         df_risk_factor (pd.DataFrame): DataFrame containing the risk factor time series (e.g., macro variables).
         df_assets (pd.DataFrame): DataFrame of asset returns. Columns are assets; rows are time periods.
         startIdx_asset (int): Starting index to slice asset return time series for alignment.
         startIdx_risk_factor (int): Starting index to slice risk factor time series for alignment.
+        return_stats (bool): If True, additionally return a DataFrame with the full regression statistics.
+        hac_lags (int): Truncation lag of the Newey-West errors in stats. Defaults to floor(4 (T/100)^(2/9)).
+        min_obs (int): Unbalanced-panel mode. If given, every asset is regressed over the periods in
+                       which its return and the risk factor are present, and kept if there are at
+                       least min_obs (and at least three) of them.
 
     Returns:
         alpha_values (pd.Series): A Series of intercepts (alphas) for each asset.
         beta_values (pd.Series): A Series of slope coefficients (betas) for each asset.
+        stats (pd.DataFrame): Only if return_stats is True. One row per asset with the columns
+                              'alpha', 'beta', 'resid_var', 'alpha_se', 'beta_se' and the
+                              Newey-West errors 'alpha_hac_se' and 'beta_hac_se'.
 
     Notes:
-        - Assets with missing values in either their return series or the risk factor are skipped.
-        - Assumes a single-column risk factor DataFrame.
+        - Without min_obs, assets with missing values in either their return series or the risk factor are skipped.
+        - Assumes a single-column risk factor DataFrame; for K factors see
+          scripts.multi_factor.multi_factor_stage_one_fama_macbeth.
         - Assumes that after slicing, each asset's return series and the risk factor have the same length.
     """
-    # Dictionaries to store regression results for each asset
-    betas = {}
-    alphas = {}
+    # Slice asset returns and risk factor to align time series
+    # (excluding the first asset column if it's a date or time column)
+    asset_names = df_assets.columns[1:]
+    Y = df_assets[asset_names].to_numpy(dtype=float)[startIdx_asset:]  # asset returns (dependent variables)
+    x = np.asarray(df_risk_factor.values, dtype=float).reshape(-1)[startIdx_risk_factor:]  # risk factor values
+
+    # Ensure x and y are of the same length
+    assert len(x) == len(Y), f"Length mismatch: {len(x)} vs {len(Y)}"
 
-    # Loop through each asset column (excluding the first if it's a date or time column)
-    for asset in df_assets.columns[1:]:
-        # Slice asset returns and risk factor to align time series
-        y = df_assets[asset].values[startIdx_asset:]  # asset returns (dependent variable)
-        x = df_risk_factor.values[startIdx_risk_factor:]  # risk factor values (independent variable)
+    if min_obs is None:
+        # Only run regressions for assets whose series and the risk factor are free of NaNs
+        valid = ~np.isnan(Y).any(axis=0)
+        if np.isnan(x).any():
+            valid[:] = False
+        mask = None
+        alpha, beta, resid_var, alpha_se, beta_se = _time_series_ols(x, Y[:, valid])
+    else:
+        # unbalanced panel: each asset uses the periods in which its return and the factor are present
+        mask = ~np.isnan(Y) & ~np.isnan(x)[:, None]
+        valid = mask.sum(axis=0) >= max(min_obs, 3)
+        mask = mask[:, valid]
+        alpha, beta, resid_var, alpha_se, beta_se = _masked_time_series_ols(x, Y[:, valid], mask)
+    names = asset_names[valid]
 
-        # Ensure x and y are of the same length
-        assert len(x) == len(y), f"Length mismatch: {len(x)} vs {len(y)} for asset {asset}"
+    # Convert results to Pandas Series for easy use in stage two
+    alpha_values = pd.Series(alpha, index=names, dtype=float)
+    beta_values = pd.Series(beta, index=names, dtype=float)
 
-        # Only run regression if both series are free of NaNs
-        if not np.any(pd.isnull(y)) and not np.any(pd.isnull(x)):
-            # Perform linear regression: y = alpha + beta * x + error
-            slope, intercept, r_value, p_value, std_err = linregress(x, y)
+    if not return_stats:
+        return alpha_values, beta_values
 
-            # Store results
-            # we only require the intercepts and the slope as this corresponds to the alpha and beta values
-            betas[asset] = slope
-            alphas[asset] = intercept
+    # annual returns and consumption growth are serially correlated, hence also HAC errors
+    if hac_lags is None:
+        hac_lags = newey_west_lag(len(x))
+    resid = Y[:, valid] - alpha - np.outer(x, beta)
+    alpha_hac_se, beta_hac_se = hac_regression_se(x, resid, hac_lags, mask)
 
-    # Convert dictionaries to Pandas Series for easy use in stage two
-    alpha_values = pd.Series(alphas)
-    beta_values = pd.Series(betas)
+    stats = pd.DataFrame({
+        'alpha': alpha,
+        'beta': beta,
+        'resid_var': resid_var,
+        'alpha_se': alpha_se,
+        'beta_se': beta_se,
+        'alpha_hac_se': alpha_hac_se,
+        'beta_hac_se': beta_hac_se,
+    }, index=names)
+    return alpha_values, beta_values, stats
 
-    return alpha_values, beta_values
+
+def _cross_sectional_projection(betas: np.ndarray) -> np.ndarray:
+    """
+    Precomputes (X'X)^-1 X' for the cross-sectional design X = [1, beta].
+
+    Because the betas do not change over time, every period's cross-sectional regression
+    is the product of this (2, N) matrix with the period's return vector.
+    """
+    X = np.column_stack((np.ones_like(betas), betas))
+    return np.linalg.solve(X.T @ X, X.T)
 
 
-def stage_two_fama_macbeth(df_assets: pd.DataFrame, betas: pd.Series):
+@instrumented
+def stage_two_fama_macbeth(df_assets: pd.DataFrame,
+                           betas: pd.Series,
+                           return_stats: bool = False,
+                           risk_factor=None,
+                           hac_lags: int = None,
+                           min_assets: int = None):
     """
     Correct Fama-MacBeth second-stage regression.
 
+    All cross-sectional regressions are solved in a single matrix product of the
+    (T x N) return block with the precomputed (X'X)^-1 X'.
+
     Parameters:
         df_assets: pd.DataFrame — asset returns (rows: time, columns: assets)
         betas: pd.Series — factor loadings from stage 1, indexed by asset name
+        return_stats: bool — if True, additionally return a dict with inference statistics
+        risk_factor: array-like — optional risk factor series used in stage 1; required for
+                     the Shanken correction (NaNs are ignored)
+        hac_lags: int — truncation lag of the Newey-West errors; defaults to floor(4 (T/100)^(2/9))
+        min_assets: int — unbalanced-panel mode; if given, every period is regressed over the assets
+                    with a return (and a beta) in that period, and kept if there are at least
+                    min_assets (and at least two) of them
 
     Returns:
         lambda_mean: float — average price of risk across time
         lambda0_mean: float — average return for assets not exposed to factor
+        stats: dict — only if return_stats is True, with the entries
+            'lambdas': pd.DataFrame — per-period estimates (columns 'lambda0', 'lambda')
+            'summary': pd.DataFrame — rows 'lambda0'/'lambda'; columns 'mean', 'fm_se', 't_stat',
+                       'shanken_se', 'shanken_t_stat', 'hac_se', 'hac_t_stat', 'shanken_hac_se',
+                       'shanken_hac_t_stat' (Shanken entries are NaN without risk_factor)
+            'r2': float — cross-sectional R² of average returns on betas
+            'hac_lags': int — truncation lag used for the HAC errors
     """
     returns = df_assets.iloc[:, 1:]  # remove first column if non-return
+    if min_assets is not None:
+        # assets without a stage-one beta cannot be priced
+        returns = returns[returns.columns.intersection(betas.index, sort=False)]
     betas = betas[returns.columns]
 
-    intercepts = []
-    slopes = []
-    for t in range(len(returns)):
-        y_t = returns.iloc[t].values  # returns at time t
-        x = betas.values  # constant across t
-        if not np.any(np.isnan(y_t)):
-            slope, intercept, _, _, _ = linregress(x, y_t)
-            slopes.append(slope)
-            intercepts.append(intercept)
+    R = returns.to_numpy(dtype=float)
+    x = betas.to_numpy(dtype=float)  # constant across t
+
+    if min_assets is None:
+        # periods with missing returns are skipped
+        valid = ~np.isnan(R).any(axis=1)
+        # row t holds (intercept_t, slope_t) of the cross-sectional regression at time t
+        lambdas = R[valid] @ _cross_sectional_projection(x).T
+    else:
+        # unbalanced panel: per-period sums over the assets present, as masked matrix products
+        mask = ~np.isnan(R)
+        w = mask.astype(float)
+        R0 = np.where(mask, R, 0.0)
+        b_center = x.mean()
+        b = x - b_center
+        n_assets = w.sum(axis=1)
+        sb = w @ b
+        sbb = w @ (b * b)
+        sr = R0.sum(axis=1)
+        sbr = R0 @ b
+        denominator = n_assets * sbb - sb ** 2
+        valid = (n_assets >= max(min_assets, 2)) & (denominator > 0)
+        slopes = (n_assets[valid] * sbr[valid] - sb[valid] * sr[valid]) / denominator[valid]
+        intercepts = (sr[valid] - slopes * sb[valid]) / n_assets[valid] - slopes * b_center
+        lambdas = np.column_stack((intercepts, slopes))
+
+    intercepts = lambdas[:, 0]
+    slopes = lambdas[:, 1]
 
     lambda_mean = np.mean(slopes)
     lambda0_mean = np.mean(intercepts)
 
-    return lambda_mean, lambda0_mean
\ No newline at end of file
+    if not return_stats:
+        return lambda_mean, lambda0_mean
+
+    n_periods = len(lambdas)
+    means = np.array([lambda0_mean, lambda_mean])
+    fm_se = lambdas.std(axis=0, ddof=1) / np.sqrt(n_periods)
+
+    # Newey-West errors of the lambda time series, whose periods are serially correlated
+    if hac_lags is None:
+        hac_lags = newey_west_lag(n_periods)
+    hac_se = newey_west_se(lambdas, hac_lags)
+
+    # Shanken (1992) errors-in-variables correction for the estimated betas
+    fm_shanken_se = np.full(2, np.nan)
+    hac_shanken_se = np.full(2, np.nan)
+    if risk_factor is not None:
+        fm_shanken_se = shanken_se(fm_se ** 2, lambda_mean, risk_factor, n_periods)
+        hac_shanken_se = shanken_se(hac_se ** 2, lambda_mean, risk_factor, n_periods)
+
+    # the average of the per-period fits equals the fit of the average returns
+    # (in unbalanced mode: of every asset's average over its own periods)
+    avg_returns = np.nanmean(R[valid], axis=0)
+    priced = ~np.isnan(avg_returns)
+    avg_returns = avg_returns[priced]
+    fitted = lambda0_mean + lambda_mean * x[priced]
+    r2 = 1 - np.sum((avg_returns - fitted) ** 2) / np.sum((avg_returns - avg_returns.mean()) ** 2)
+
+    stats = {
+        'lambdas': pd.DataFrame(lambdas,
+                                index=df_assets.iloc[:, 0].to_numpy()[valid],
+                                columns=['lambda0', 'lambda']),
+        'summary': pd.DataFrame({
+            'mean': means,
+            'fm_se': fm_se,
+            't_stat': means / fm_se,
+            'shanken_se': fm_shanken_se,
+            'shanken_t_stat': means / fm_shanken_se,
+            'hac_se': hac_se,
+            'hac_t_stat': means / hac_se,
+            'shanken_hac_se': hac_shanken_se,
+            'shanken_hac_t_stat': means / hac_shanken_se,
+        }, index=['lambda0', 'lambda']),
+        'r2': r2,
+        'hac_lags': hac_lags,
+    }
+    return lambda_mean, lambda0_mean, stats
+
+
+def rolling_stage_one_fama_macbeth(df_risk_factor: pd.DataFrame,
+                                   df_assets: pd.DataFrame,
+                                   startIdx_asset,
+                                   startIdx_risk_factor,
+                                   window: int = None,
+                                   min_periods: int = None):
+    """
+    Time-varying first stage: rolling (or expanding) window betas for every asset.
+
+    Running sums of x, y, x² and xy are kept per asset as cumulative sums, so sliding the
+    window by one period is an O(1) update per asset and the whole (T x N) beta panel is
+    produced in a single vectorized sweep instead of one stage-one run per window.
+
+    Args:
+        df_risk_factor (pd.DataFrame): Risk factor time series, aligned as in stage_one_fama_macbeth.
+        df_assets (pd.DataFrame): Asset returns; the first column holds the period labels.
+        startIdx_asset (int): Starting index to slice asset return time series for alignment.
+        startIdx_risk_factor (int): Starting index to slice risk factor time series for alignment.
+        window (int): Length of the rolling window. None gives expanding windows from the first period.
+        min_periods (int): Minimum number of valid observations per window. Defaults to the window
+                           length for rolling windows (any missing value invalidates the window,
+                           as in stage_one_fama_macbeth) and to 2 for expanding windows.
+
+    Returns:
+        alpha_panel (pd.DataFrame): Intercepts estimated with data up to and including each period.
+        beta_panel (pd.DataFrame): Slopes estimated with data up to and including each period.
+            Both are indexed by period with one column per asset; windows with too few
+            observations are NaN.
+    """
+    asset_names = df_assets.columns[1:]
+    periods = df_assets.iloc[startIdx_asset:, 0].to_numpy()
+    Y = df_assets[asset_names].to_numpy(dtype=float)[startIdx_asset:]
+    x = np.asarray(df_risk_factor.values, dtype=float).reshape(-1)[startIdx_risk_factor:]
+
+    # Ensure x and y are of the same length
+    assert len(x) == len(Y), f"Length mismatch: {len(x)} vs {len(Y)}"
+    if min_periods is None:
+        min_periods = window if window is not None else 2
+
+    # an observation counts for an asset only if both its return and the factor are present
+    valid = ~np.isnan(Y) & ~np.isnan(x)[:, None]
+    # centering on the full-sample means keeps the differenced sums numerically stable
+    x_mean = np.nanmean(x)
+    y_mean = np.nanmean(Y, axis=0)
+    xc = np.where(valid, (x - x_mean)[:, None], 0.0)
+    yc = np.where(valid, Y - y_mean, 0.0)
+
+    def window_sums(values):
+        # running sum over the window: cumulative sum minus the sum that left the window
+        csum = np.cumsum(values, axis=0)
+        if window is not None and window < len(csum):
+            csum[window:] -= csum[:-window].copy()
+        return csum
+
+    n = window_sums(valid.astype(float))
+    sx = window_sums(xc)
+    sy = window_sums(yc)
+    sxx = window_sums(xc * xc)
+    sxy = window_sums(xc * yc)
+
+    enough = n >= max(min_periods, 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        beta = (n * sxy - sx * sy) / (n * sxx - sx ** 2)
+        alpha = (sy - beta * sx) / n + y_mean - beta * x_mean
+    beta[~enough] = np.nan
+    alpha[~enough] = np.nan
+
+    alpha_panel = pd.DataFrame(alpha, index=periods, columns=asset_names)
+    beta_panel = pd.DataFrame(beta, index=periods, columns=asset_names)
+    return alpha_panel, beta_panel
+
+
+def rolling_stage_two_fama_macbeth(df_assets: pd.DataFrame, beta_panel: pd.DataFrame, lag: int = 1):
+    """
+    Second-stage regressions with time-varying betas.
+
+    The returns of period t are regressed on the betas estimated with data up to period t - lag,
+    so no look-ahead enters the cross-section. Every period has its own regressor, hence the
+    slopes and intercepts are computed from vectorized cross-sectional sums instead of a
+    shared projection matrix.
+
+    Parameters:
+        df_assets: pd.DataFrame — asset returns (rows: time, columns: assets; first column holds periods)
+        beta_panel: pd.DataFrame — betas indexed by period, e.g. from rolling_stage_one_fama_macbeth
+        lag: int — number of periods between beta estimation and the priced return
+
+    Returns:
+        lambda_mean: float — average price of risk across time
+        lambda0_mean: float — average return for assets not exposed to factor
+        lambdas: pd.DataFrame — per-period estimates (columns 'lambda0', 'lambda')
+
+    Notes:
+        - Periods where any asset lacks a return or a lagged beta are skipped, as in stage_two_fama_macbeth.
+    """
+    returns = df_assets.iloc[:, 1:]
+    periods = df_assets.iloc[:, 0].to_numpy()
+    lagged_betas = beta_panel[returns.columns].shift(lag).reindex(periods)
+
+    R = returns.to_numpy(dtype=float)
+    B = lagged_betas.to_numpy(dtype=float)
+    valid = ~(np.isnan(R) | np.isnan(B)).any(axis=1)
+    R = R[valid]
+    B = B[valid]
+
+    n_assets = R.shape[1]
+    sx = B.sum(axis=1)
+    sy = R.sum(axis=1)
+    slopes = (n_assets * np.einsum('ij,ij->i', B, R) - sx * sy) / (n_assets * np.einsum('ij,ij->i', B, B) - sx ** 2)
+    intercepts = (sy - slopes * sx) / n_assets
+
+    lambdas = pd.DataFrame({'lambda0': intercepts, 'lambda': slopes}, index=periods[valid])
+    return np.mean(slopes), np.mean(intercepts), lambdas
+
+
+def batched_time_series_ols(X: np.ndarray, Y: np.ndarray):
+    """
+    Stage-one intercepts and slopes for a batch of single-factor regressions.
+
+    Leading axes of X and Y are broadcast against each other, so many candidate factors
+    (e.g. one per Omega) or many resampled panels are regressed in one tensor contraction.
+
+    Args:
+        X (np.ndarray): Risk factors of shape (..., T), free of NaNs.
+        Y (np.ndarray): Asset returns of shape (..., T, N), free of NaNs.
+
+    Returns:
+        alpha (np.ndarray): Intercepts of shape (..., N).
+        beta (np.ndarray): Slopes of shape (..., N).
+    """
+    x_mean = X.mean(axis=-1)
+    x_dev = X - x_mean[..., None]
+    sxx = np.einsum('...t,...t->...', x_dev, x_dev)
+    beta = np.einsum('...t,...tn->...n', x_dev, Y) / sxx[..., None]
+    alpha = Y.mean(axis=-2) - beta * x_mean[..., None]
+    return alpha, beta
+
+
+def batched_cross_sectional_ols(betas: np.ndarray, avg_returns: np.ndarray):
+    """
+    Stage-two prices of risk for a batch of beta vectors.
+
+    With betas that are constant over time, the mean of the per-period cross-sectional slopes
+    equals the slope of the average returns on the betas, so only the (..., N) average
+    returns over the complete periods are needed.
+
+    Args:
+        betas (np.ndarray): Stage-one betas of shape (..., N).
+        avg_returns (np.ndarray): Average asset returns of shape (..., N).
+
+    Returns:
+        lambda_mean (np.ndarray): Prices of risk, shape (...).
+        lambda0_mean (np.ndarray): Intercepts, shape (...).
+        r2 (np.ndarray): Cross-sectional R² of the average returns, shape (...).
+    """
+    beta_mean = betas.mean(axis=-1)
+    beta_dev = betas - beta_mean[..., None]
+    avg_mean = avg_returns.mean(axis=-1)
+    lambda_mean = np.einsum('...n,...n->...', beta_dev, avg_returns) / np.einsum('...n,...n->...', beta_dev, beta_dev)
+    lambda0_mean = avg_mean - lambda_mean * beta_mean
+
+    resid = avg_returns - lambda0_mean[..., None] - lambda_mean[..., None] * betas
+    avg_dev = avg_returns - avg_mean[..., None]
+    r2 = 1 - np.einsum('...n,...n->...', resid, resid) / np.einsum('...n,...n->...', avg_dev, avg_dev)
+    return lambda_mean, lambda0_mean, r2
+
+
+def batched_fama_macbeth(risk_factors: np.ndarray,
+                         df_assets: pd.DataFrame,
+                         startIdx_asset,
+                         startIdx_risk_factor):
+    """
+    Runs both Fama-MacBeth stages for K candidate risk factors against the same assets.
+
+    Equivalent to calling stage_one_fama_macbeth and stage_two_fama_macbeth once per column
+    of risk_factors, but all candidates share one pass of matrix operations.
+
+    Args:
+        risk_factors (np.ndarray): Candidate risk factor series of shape (T, K), rows aligned like
+                                   the single risk factor of stage_one_fama_macbeth.
+        df_assets (pd.DataFrame): Asset returns; the first column holds the period labels.
+        startIdx_asset (int): Starting index to slice asset return time series for alignment.
+        startIdx_risk_factor (int): Starting index to slice risk factor time series for alignment.
+
+    Returns:
+        results (pd.DataFrame): One row per candidate with the columns 'lambda', 'lambda0' and 'r2'.
+        beta_values (pd.DataFrame): Stage-one betas, one row per candidate and one column per asset.
+
+    Notes:
+        - Assets with missing values in the stage-one window are skipped, as in stage_one_fama_macbeth.
+        - Candidates with missing values in the stage-one window yield NaN results.
+    """
+    asset_names = df_assets.columns[1:]
+    returns = df_assets[asset_names].to_numpy(dtype=float)
+    Y = returns[startIdx_asset:]
+    F = np.asarray(risk_factors, dtype=float)
+    if F.ndim == 1:
+        F = F[:, None]
+    X = F[startIdx_risk_factor:].T  # (K, T)
+
+    # Ensure x and y are of the same length
+    assert X.shape[1] == len(Y), f"Length mismatch: {X.shape[1]} vs {len(Y)}"
+
+    valid_assets = ~np.isnan(Y).any(axis=0)
+    _, betas = batched_time_series_ols(X, Y[:, valid_assets])
+
+    # stage two skips periods where any of the priced assets has a missing return
+    priced = returns[:, valid_assets]
+    avg_returns = priced[~np.isnan(priced).any(axis=1)].mean(axis=0)
+    lambda_mean, lambda0_mean, r2 = batched_cross_sectional_ols(betas, avg_returns)
+
+    results = pd.DataFrame({'lambda': lambda_mean, 'lambda0': lambda0_mean, 'r2': r2})
+    beta_values = pd.DataFrame(betas, columns=asset_names[valid_assets])
+    return results, beta_values
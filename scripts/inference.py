@@ -0,0 +1,164 @@
+import numpy as np
+from scipy import fft
+
+# up to this many lags the lagged cross-products are summed directly, beyond that via FFT
+_DIRECT_MAX_LAG = 8
+
+
+def newey_west_lag(n_obs: int) -> int:
+    """Newey-West (1994) rule of thumb for the truncation lag, floor(4 (T/100)^(2/9))."""
+    return int(np.floor(4 * (n_obs / 100) ** (2 / 9)))
+
+
+def lagged_cross_products(a: np.ndarray, b: np.ndarray, max_lag: int) -> np.ndarray:
+    """
+    Sums Σₜ aₜ bₜ₊ₗ for all lags l = 0..max_lag and all columns at once.
+
+    For few lags the sums are batched products of shifted blocks, O(T·L·N); for many lags
+    they are read off the FFT cross-correlation of the zero-padded series, O(T log T · N).
+
+    Args:
+        a (np.ndarray): Series of shape (T,) or (T, N).
+        b (np.ndarray): Series of the same shape as a.
+        max_lag (int): Largest lag, at most T - 1.
+
+    Returns:
+        np.ndarray: Shape (max_lag + 1,) or (max_lag + 1, N).
+    """
+    n_obs = len(a)
+    max_lag = min(max_lag, n_obs - 1)
+    if max_lag <= _DIRECT_MAX_LAG:
+        return np.stack([np.einsum('t...,t...->...', a[:n_obs - lag], b[lag:]) for lag in range(max_lag + 1)])
+    # zero padding to at least 2T turns the circular correlation into the linear one
+    size = fft.next_fast_len(2 * n_obs, real=True)
+    spectrum = np.conj(fft.rfft(a, size, axis=0)) * fft.rfft(b, size, axis=0)
+    return fft.irfft(spectrum, size, axis=0)[:max_lag + 1]
+
+
+def autocovariances(series: np.ndarray, max_lag: int) -> np.ndarray:
+    """
+    Sample autocovariances γₗ = (1/T) Σₜ (xₜ − x̄)(xₜ₊ₗ − x̄) for l = 0..max_lag of every column.
+
+    Args:
+        series (np.ndarray): Shape (T,) or (T, N), free of NaNs.
+        max_lag (int): Largest lag.
+
+    Returns:
+        np.ndarray: Shape (max_lag + 1,) or (max_lag + 1, N).
+    """
+    x = np.asarray(series, dtype=float)
+    x = x - x.mean(axis=0)
+    return lagged_cross_products(x, x, max_lag) / len(x)
+
+
+def bartlett_weights(lags, max_lag: int) -> np.ndarray:
+    """Bartlett kernel weights 1 − l/(L + 1) for l = 0..max_lag, one row per truncation lag L."""
+    lags = np.atleast_1d(np.asarray(lags))
+    l = np.arange(max_lag + 1)
+    return np.clip(1 - l / (lags[:, None] + 1), 0, None)
+
+
+def long_run_covariance(a: np.ndarray, b: np.ndarray, lags) -> np.ndarray:
+    """
+    Newey-West long-run covariance Σₜ Σₛ w(|t − s|) aₜ bₛ of the (already demeaned) scores a and b.
+
+    All truncation lags are evaluated from one set of lagged cross-products.
+
+    Args:
+        a, b (np.ndarray): Scores of shape (T,) or (T, N).
+        lags (int or array-like): Truncation lag(s) L.
+
+    Returns:
+        np.ndarray: Shape (n_lags,) + a.shape[1:]; the first axis is dropped for a scalar lag.
+    """
+    scalar = np.ndim(lags) == 0
+    max_lag = int(np.max(lags))
+    ab = lagged_cross_products(a, b, max_lag)
+    ba = ab if b is a else lagged_cross_products(b, a, max_lag)
+    max_lag = len(ab) - 1
+    w = bartlett_weights(lags, max_lag)
+    # lag zero enters once, every other lag in both directions
+    omega = np.tensordot(w, ab + ba, axes=(1, 0)) - ab[0]
+    return omega[0] if scalar else omega
+
+
+def newey_west_se(series: np.ndarray, lags) -> np.ndarray:
+    """
+    HAC (Newey-West) standard errors of the mean of every column, e.g. of the per-period lambdas.
+
+    Args:
+        series (np.ndarray): Shape (T,) or (T, N), free of NaNs.
+        lags (int or array-like): Truncation lag(s).
+
+    Returns:
+        np.ndarray: Shape (n_lags,) + series.shape[1:]; the first axis is dropped for a scalar lag.
+    """
+    x = np.asarray(series, dtype=float)
+    x = x - x.mean(axis=0)
+    return np.sqrt(np.maximum(long_run_covariance(x, x, lags), 0)) / len(x)
+
+
+def hac_regression_se(x: np.ndarray, resid: np.ndarray, lags, mask: np.ndarray = None):
+    """
+    HAC (Newey-West) standard errors of the intercepts and slopes of single-factor time-series
+    regressions sharing the regressor x, e.g. the stage-one betas of all assets.
+
+    The sandwich (Z'Z)⁻¹ Ω (Z'Z)⁻¹ is evaluated with Z = [1, x − x̄], which makes Z'Z diagonal;
+    the intercept of the uncentered regression is recovered as a − b x̄. For unbalanced panels the
+    scores outside the mask are zero, i.e. gaps in an asset's series drop out of the sums.
+
+    Args:
+        x (np.ndarray): Regressor of shape (T,).
+        resid (np.ndarray): OLS residuals of shape (T, N).
+        lags (int or array-like): Truncation lag(s).
+        mask (np.ndarray): Optional boolean (T, N) of the observations used by each regression.
+
+    Returns:
+        alpha_se (np.ndarray): Shape (n_lags, N), or (N,) for a scalar lag.
+        beta_se (np.ndarray): Same shape as alpha_se.
+    """
+    if mask is None:
+        n_obs = len(x)
+        x_mean = x.mean()
+        x_dev = (x - x_mean)[:, None]
+    else:
+        w = mask.astype(float)
+        x0 = np.nan_to_num(x)
+        n_obs = w.sum(axis=0)
+        x_mean = (x0 @ w) / n_obs
+        x_dev = np.where(mask, x0[:, None] - x_mean, 0.0)
+        resid = np.where(mask, resid, 0.0)
+    sxx = np.sum(x_dev ** 2, axis=0)
+    # scores of the intercept and the slope; both sum to zero by the normal equations
+    score_slope = x_dev * resid
+
+    omega_00 = long_run_covariance(resid, resid, lags)
+    omega_11 = long_run_covariance(score_slope, score_slope, lags)
+    omega_01 = long_run_covariance(resid, score_slope, lags)
+
+    var_beta = omega_11 / sxx ** 2
+    cov_centered = omega_01 / (n_obs * sxx)
+    var_alpha = omega_00 / n_obs ** 2 - 2 * x_mean * cov_centered + x_mean ** 2 * var_beta
+    return np.sqrt(np.maximum(var_alpha, 0)), np.sqrt(np.maximum(var_beta, 0))
+
+
+def shanken_se(variances: np.ndarray, lambda_mean: float, risk_factor, n_periods: int) -> np.ndarray:
+    """
+    Shanken (1992) errors-in-variables correction of second-stage standard errors.
+
+    Args:
+        variances (np.ndarray): Variances of the mean (lambda0, lambda), e.g. Fama-MacBeth or HAC.
+        lambda_mean (float): Average price of risk.
+        risk_factor (array-like): Risk factor series used in stage one (NaNs are ignored).
+        n_periods (int): Number of second-stage periods.
+
+    Returns:
+        np.ndarray: Corrected standard errors of (lambda0, lambda).
+    """
+    f = np.asarray(risk_factor, dtype=float).reshape(-1)
+    f = f[~np.isnan(f)]
+    factor_var = f.var(ddof=1)
+    c = lambda_mean ** 2 / factor_var
+    shanken_var = (1 + c) * np.asarray(variances, dtype=float)
+    shanken_var[1] += factor_var / n_periods
+    return np.sqrt(shanken_var)
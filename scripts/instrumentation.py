@@ -0,0 +1,156 @@
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+
+# the active Recorder; None while instrumentation is disabled
+_recorder = None
+_disabled = nullcontext()
+
+
+class Recorder:
+    """
+    Collects timed spans: wall time, CPU time of the calling thread and, optionally, the peak
+    traced memory (tracemalloc) allocated on top of the memory in use when the span started.
+
+    Memory is traced per process, so spans running concurrently on other threads contribute
+    to each other's peaks. Spans of stages run on a process pool are not recorded.
+    """
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.events = []
+        self._open = []
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+        self._started_tracemalloc = False
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def close(self):
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def _update_peaks(self):
+        # fold the peak since the last reset into every open span, then start a new measurement
+        _, peak = tracemalloc.get_traced_memory()
+        for span in self._open:
+            span['peak'] = max(span['peak'], peak)
+        tracemalloc.reset_peak()
+
+    @contextmanager
+    def span(self, name: str, category: str = 'function'):
+        span = {'name': name, 'cat': category, 'tid': threading.get_ident()}
+        if self.trace_memory:
+            with self._lock:
+                self._update_peaks()
+                span['start_memory'] = span['peak'] = tracemalloc.get_traced_memory()[0]
+                self._open.append(span)
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall_start, time.thread_time() - cpu_start
+            with self._lock:
+                if self.trace_memory:
+                    self._update_peaks()
+                    self._open.remove(span)
+                    span['peak_memory'] = span.pop('peak') - span.pop('start_memory')
+                span.update(start=wall_start - self._t0, wall=wall, cpu=cpu)
+                self.events.append(span)
+
+    def summary(self) -> pd.DataFrame:
+        """
+        Returns:
+            pd.DataFrame: One row per span name with the columns 'category', 'calls', 'wall_total',
+                          'wall_mean', 'cpu_total' (seconds) and, if memory is traced,
+                          'peak_memory' (largest peak of a call, bytes); sorted by total wall time.
+        """
+        columns = ['category', 'calls', 'wall_total', 'wall_mean', 'cpu_total']
+        if self.trace_memory:
+            columns.append('peak_memory')
+        if not self.events:
+            return pd.DataFrame(columns=columns)
+        events = pd.DataFrame(self.events)
+        aggregations = {
+            'category': ('cat', 'first'),
+            'calls': ('wall', 'size'),
+            'wall_total': ('wall', 'sum'),
+            'wall_mean': ('wall', 'mean'),
+            'cpu_total': ('cpu', 'sum'),
+        }
+        if self.trace_memory:
+            aggregations['peak_memory'] = ('peak_memory', 'max')
+        return events.groupby('name').agg(**aggregations).sort_values('wall_total', ascending=False)[columns]
+
+    def chrome_trace(self) -> dict:
+        """The spans as complete ('X') events of the Chrome trace event format (chrome://tracing, Perfetto)."""
+        pid = os.getpid()
+        events = []
+        for e in self.events:
+            args = {'cpu_ms': e['cpu'] * 1e3}
+            if 'peak_memory' in e:
+                args['peak_memory_kib'] = e['peak_memory'] / 2 ** 10
+            events.append({'name': e['name'], 'cat': e['cat'], 'ph': 'X', 'pid': pid, 'tid': e['tid'],
+                           'ts': e['start'] * 1e6, 'dur': e['wall'] * 1e6, 'args': args})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
+
+def enable(trace_memory: bool = False) -> Recorder:
+    """Starts recording spans in a new Recorder and returns it."""
+    global _recorder
+    disable()
+    _recorder = Recorder(trace_memory)
+    return _recorder
+
+
+def disable() -> Recorder:
+    """Stops recording and returns the last Recorder (or None)."""
+    global _recorder
+    recorder, _recorder = _recorder, None
+    if recorder is not None:
+        recorder.close()
+    return recorder
+
+
+def get_recorder() -> Recorder:
+    return _recorder
+
+
+def span(name: str, category: str = 'function'):
+    """Context manager recording the enclosed block; a shared no-op while disabled."""
+    if _recorder is None:
+        return _disabled
+    return _recorder.span(name, category)
+
+
+def instrumented(func=None, *, name: str = None, category: str = 'function'):
+    """
+    Decorator recording every call of a function as a span named after the function.
+
+    While instrumentation is disabled the wrapper only checks a module global before calling
+    through, so hot functions can stay decorated.
+    """
+    if func is None:
+        return functools.partial(instrumented, name=name, category=category)
+    span_name = name or func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _recorder is None:
+            return func(*args, **kwargs)
+        with _recorder.span(span_name, category):
+            return func(*args, **kwargs)
+
+    return wrapper
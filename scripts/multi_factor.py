@@ -0,0 +1,196 @@
+import numpy as np
+import pandas as pd
+
+from scripts.instrumentation import instrumented
+
+
+def _factor_frame(df_risk_factors) -> pd.DataFrame:
+    # accepts a DataFrame of K factor columns, a single Series or a (T,) / (T, K) array
+    if isinstance(df_risk_factors, pd.DataFrame):
+        return df_risk_factors
+    if isinstance(df_risk_factors, pd.Series):
+        return df_risk_factors.to_frame(df_risk_factors.name if df_risk_factors.name is not None else 'factor')
+    F = np.asarray(df_risk_factors, dtype=float)
+    F = F.reshape(len(F), -1)
+    return pd.DataFrame(F, columns=[f'factor_{k}' for k in range(F.shape[1])])
+
+
+def _qr_projection(Z: np.ndarray):
+    """
+    OLS projection for the design Z of full column rank, via one thin QR factorization Z = QR.
+
+    Returns:
+        projection (np.ndarray): (Z'Z)^-1 Z' = R^-1 Q', shape (P, rows of Z).
+        inv_gram (np.ndarray): (Z'Z)^-1 = R^-1 R^-T, shape (P, P), for the coefficient covariances.
+    """
+    Q, R = np.linalg.qr(Z)
+    R_inv = np.linalg.solve(R, np.eye(R.shape[0]))
+    return R_inv @ Q.T, R_inv @ R_inv.T
+
+
+def multi_factor_time_series_ols(X: np.ndarray, Y: np.ndarray):
+    """
+    OLS of every column of Y on the K regressors in X (with intercept).
+
+    The design [1, X] is shared by all N assets, so it is factorized once and the coefficients
+    of all assets follow from a single (K + 1, T) x (T, N) product.
+
+    Args:
+        X (np.ndarray): Regressors of shape (T, K), free of NaNs.
+        Y (np.ndarray): Dependent variables of shape (T, N), free of NaNs.
+
+    Returns:
+        alpha (np.ndarray): Intercepts, shape (N,).
+        beta (np.ndarray): Slopes, shape (N, K).
+        resid_var (np.ndarray): Residual variances with T - K - 1 degrees of freedom, shape (N,).
+        alpha_se (np.ndarray): Standard errors of the intercepts, shape (N,).
+        beta_se (np.ndarray): Standard errors of the slopes, shape (N, K).
+    """
+    n_obs, n_factors = X.shape
+    Z = np.column_stack((np.ones(n_obs), X))
+    projection, inv_gram = _qr_projection(Z)
+
+    coef = projection @ Y  # (K + 1, N)
+    resid = Y - Z @ coef
+    resid_var = np.einsum('ij,ij->j', resid, resid) / (n_obs - n_factors - 1)
+    se = np.sqrt(np.outer(np.diag(inv_gram), resid_var))  # (K + 1, N)
+
+    return coef[0], coef[1:].T, resid_var, se[0], se[1:].T
+
+
+@instrumented
+def multi_factor_stage_one_fama_macbeth(df_risk_factors: pd.DataFrame,
+                                        df_assets: pd.DataFrame,
+                                        startIdx_asset,
+                                        startIdx_risk_factor,
+                                        return_stats: bool = False):
+    """
+    First Fama-MacBeth stage with K risk factors, e.g. consumption growth, market, SMB and HML.
+
+    Each asset's returns are regressed on all factors at once. With a single factor the results
+    equal stage_one_fama_macbeth, which remains the closed-form special case.
+
+    Args:
+        df_risk_factors (pd.DataFrame): Risk factor time series, one column per factor
+                                        (a Series or array is treated as K = 1).
+        df_assets (pd.DataFrame): DataFrame of asset returns. Columns are assets; rows are time periods.
+        startIdx_asset (int): Starting index to slice asset return time series for alignment.
+        startIdx_risk_factor (int): Starting index to slice risk factor time series for alignment.
+        return_stats (bool): If True, additionally return the regression statistics.
+
+    Returns:
+        alpha_values (pd.Series): Intercepts (alphas) for each asset.
+        beta_values (pd.DataFrame): Factor loadings, one row per asset and one column per factor.
+        stats (dict): Only if return_stats is True, with the entries 'resid_var' and 'alpha_se'
+                      (pd.Series per asset) and 'beta_se' (pd.DataFrame shaped like beta_values).
+
+    Notes:
+        - Assets with missing values in their return series are skipped; if any factor has a
+          missing value in the window, all assets are skipped (as in stage_one_fama_macbeth).
+    """
+    factors = _factor_frame(df_risk_factors)
+    asset_names = df_assets.columns[1:]
+    Y = df_assets[asset_names].to_numpy(dtype=float)[startIdx_asset:]
+    X = factors.to_numpy(dtype=float)[startIdx_risk_factor:]
+
+    # Ensure X and Y are of the same length
+    assert len(X) == len(Y), f"Length mismatch: {len(X)} vs {len(Y)}"
+
+    valid = ~np.isnan(Y).any(axis=0)
+    if np.isnan(X).any():
+        valid[:] = False
+    names = asset_names[valid]
+
+    alpha, beta, resid_var, alpha_se, beta_se = multi_factor_time_series_ols(X, Y[:, valid])
+
+    alpha_values = pd.Series(alpha, index=names, dtype=float)
+    beta_values = pd.DataFrame(beta, index=names, columns=factors.columns)
+    if not return_stats:
+        return alpha_values, beta_values
+
+    stats = {
+        'resid_var': pd.Series(resid_var, index=names),
+        'alpha_se': pd.Series(alpha_se, index=names),
+        'beta_se': pd.DataFrame(beta_se, index=names, columns=factors.columns),
+    }
+    return alpha_values, beta_values, stats
+
+
+@instrumented
+def multi_factor_stage_two_fama_macbeth(df_assets: pd.DataFrame,
+                                        betas: pd.DataFrame,
+                                        return_stats: bool = False,
+                                        risk_factors=None):
+    """
+    Second Fama-MacBeth stage on the N x K beta matrix of multi_factor_stage_one_fama_macbeth.
+
+    The cross-sectional design [1, B] is the same in every period, so it is factorized once and
+    all period regressions are a single (T x N) x (N x (K + 1)) product.
+
+    Parameters:
+        df_assets: pd.DataFrame — asset returns (rows: time, columns: assets; first column holds periods)
+        betas: pd.DataFrame — factor loadings from stage 1, indexed by asset name, one column per factor
+        return_stats: bool — if True, additionally return a dict with inference statistics
+        risk_factors: array-like — optional (T, K) factor series used in stage 1; required for
+                      the Shanken correction (rows with NaNs are ignored)
+
+    Returns:
+        lambda_mean: pd.Series — average price of risk of every factor
+        lambda0_mean: float — average return for assets not exposed to the factors
+        stats: dict — only if return_stats is True, with the entries
+            'lambdas': pd.DataFrame — per-period estimates (columns 'lambda0' and the factor names)
+            'summary': pd.DataFrame — rows 'lambda0' and the factor names; columns 'mean', 'fm_se',
+                       't_stat', 'shanken_se', 'shanken_t_stat' (Shanken entries are NaN without risk_factors)
+            'r2': float — cross-sectional R² of average returns on betas
+    """
+    if isinstance(betas, pd.Series):
+        betas = betas.to_frame('lambda')
+    returns = df_assets.iloc[:, 1:]
+    B = betas.loc[returns.columns].to_numpy(dtype=float)
+    R = returns.to_numpy(dtype=float)
+    # periods with missing returns are skipped
+    valid = ~np.isnan(R).any(axis=1)
+
+    X = np.column_stack((np.ones(len(B)), B))
+    projection, _ = _qr_projection(X)
+    # row t holds (intercept_t, slope_t1, ..., slope_tK) of the cross-sectional regression at time t
+    lambdas = R[valid] @ projection.T
+
+    means = lambdas.mean(axis=0)
+    lambda_mean = pd.Series(means[1:], index=betas.columns)
+    lambda0_mean = means[0]
+    if not return_stats:
+        return lambda_mean, lambda0_mean
+
+    n_periods = len(lambdas)
+    fm_se = lambdas.std(axis=0, ddof=1) / np.sqrt(n_periods)
+
+    # Shanken (1992) errors-in-variables correction for the estimated betas
+    shanken_se = np.full(len(means), np.nan)
+    if risk_factors is not None:
+        F = np.asarray(risk_factors, dtype=float).reshape(-1, B.shape[1])
+        F = F[~np.isnan(F).any(axis=1)]
+        factor_cov = np.atleast_2d(np.cov(F, rowvar=False))
+        c = means[1:] @ np.linalg.solve(factor_cov, means[1:])
+        shanken_var = (1 + c) * fm_se ** 2
+        shanken_var[1:] += np.diag(factor_cov) / n_periods
+        shanken_se = np.sqrt(shanken_var)
+
+    # the average of the per-period fits equals the fit of the average returns
+    avg_returns = R[valid].mean(axis=0)
+    resid = avg_returns - X @ means
+    r2 = 1 - resid @ resid / np.sum((avg_returns - avg_returns.mean()) ** 2)
+
+    index = ['lambda0', *betas.columns]
+    stats = {
+        'lambdas': pd.DataFrame(lambdas, index=df_assets.iloc[:, 0].to_numpy()[valid], columns=index),
+        'summary': pd.DataFrame({
+            'mean': means,
+            'fm_se': fm_se,
+            't_stat': means / fm_se,
+            'shanken_se': shanken_se,
+            'shanken_t_stat': means / shanken_se,
+        }, index=index),
+        'r2': r2,
+    }
+    return lambda_mean, lambda0_mean, stats
@@ -0,0 +1,255 @@
+import numpy as np
+import pandas as pd
+
+from scripts.fama_macbeth import batched_cross_sectional_ols, stage_one_fama_macbeth, stage_two_fama_macbeth
+from scripts.unfiltering import unfilter_log_consumption
+
+BRANCHES = ('filtered', 'unfiltered')
+
+
+def _real_consumption_per_capita(nondurables, services, prc_index_nondurables, prc_index_services, pop):
+    # price adjusted total consumption per capita (population in thousands, consumption in millions)
+    total_real_consumption = nondurables / prc_index_nondurables + services / prc_index_services
+    return total_real_consumption * (10 ** 6) / (pop * (10 ** 3))
+
+
+class OnlineFamaMacBeth:
+    """
+    Incremental version of the consumption pipeline and both Fama-MacBeth stages.
+
+    Instead of the full history, the model keeps sufficient statistics: the last consumption
+    level, filtered growth rate and unfiltered log level for the unfiltering recursion, running
+    means and co-moments of factor and returns per asset for stage one (Welford updates), and
+    the running sum of returns per asset for stage two. Appending a year therefore
+    costs O(N) instead of recomputing O(T·N) regressions.
+
+    Stage one pairs factor and returns of the same year and uses every year in which the factor
+    is defined, which matches the start offsets used in main.py (3/1 filtered, 5/3 unfiltered).
+    """
+
+    def __init__(self,
+                 df_consumption: pd.DataFrame,
+                 df_population: pd.DataFrame,
+                 df_price_index: pd.DataFrame,
+                 df_test_assets: pd.DataFrame,
+                 omega: float = 0.46):
+        """
+        Initializes the statistics from the historical input tables (as read in main.py).
+        """
+        self.omega = omega
+        self.asset_names = df_test_assets.columns[1:]
+
+        # Task 2 and 3 on the history
+        years = df_consumption['year'].to_numpy(dtype=np.int64)
+        assert (years == df_population['year'].to_numpy()).all()
+        consumption = _real_consumption_per_capita(
+            df_consumption['nondurables'].to_numpy(dtype=float),
+            df_consumption['services'].to_numpy(dtype=float),
+            df_price_index['prc_index_nondurables'].to_numpy(dtype=float),
+            df_price_index['prc_index_services'].to_numpy(dtype=float),
+            df_population['pop'].to_numpy(dtype=float),
+        )
+        filtered = np.full(len(consumption), np.nan)
+        filtered[1:] = np.log(consumption[1:] / consumption[:-1])
+        unfiltered_level, unfiltered = unfilter_log_consumption(consumption, filtered, omega)
+
+        self._years = list(years)
+        self._consumption = list(consumption)
+        self._filtered = list(filtered)
+        self._unfiltered_level = list(unfiltered_level)
+        self._unfiltered = list(unfiltered)
+
+        # stage two: running sum of returns per asset. Only assets without missing returns are
+        # priced, so every period is complete for them and counts.
+        asset_years = df_test_assets.iloc[:, 0].to_numpy(dtype=np.int64)
+        R = df_test_assets.iloc[:, 1:].to_numpy(dtype=float)
+        self.n_periods = len(R)
+        self.sum_returns = np.nan_to_num(R).sum(axis=0)
+
+        # stage one: moments over the years in which factor and returns are both available
+        factor_by_year = {'filtered': dict(zip(years, filtered)), 'unfiltered': dict(zip(years, unfiltered))}
+        self.has_nan = np.zeros(len(self.asset_names), dtype=bool)
+        self._moments = {}
+        for branch in BRANCHES:
+            x = np.array([factor_by_year[branch].get(y, np.nan) for y in asset_years])
+            use = ~np.isnan(x)
+            self._moments[branch] = self._initial_moments(x[use], R[use])
+            self.has_nan |= np.isnan(R[use]).any(axis=0)
+
+    @staticmethod
+    def _initial_moments(x: np.ndarray, Y: np.ndarray) -> dict:
+        Y = np.nan_to_num(Y)
+        mean_x = x.mean()
+        mean_y = Y.mean(axis=0)
+        return {
+            'n': len(x),
+            'mean_x': mean_x,
+            'mean_y': mean_y,
+            'm2_x': np.sum((x - mean_x) ** 2),
+            'c_xy': (x - mean_x) @ (Y - mean_y),
+        }
+
+    @staticmethod
+    def _update_moments(m: dict, x: float, y: np.ndarray):
+        # Welford's update of means and co-moments, O(N)
+        m['n'] += 1
+        dx = x - m['mean_x']
+        m['mean_x'] += dx / m['n']
+        m['mean_y'] += (y - m['mean_y']) / m['n']
+        m['m2_x'] += dx * (x - m['mean_x'])
+        m['c_xy'] += dx * (y - m['mean_y'])
+
+    def append(self, year: int, nondurables, services, prc_index_nondurables, prc_index_services, pop,
+               asset_returns):
+        """
+        Adds one year of NIPA data and test asset returns.
+
+        Args:
+            year (int): The new year; must follow the last year of the history.
+            nondurables, services: Nominal consumption of non-durables and services.
+            prc_index_nondurables, prc_index_services: Price indices of non-durables and services.
+            pop: Population (in thousands).
+            asset_returns (array-like): Returns of the test assets, ordered like the asset columns.
+
+        Returns:
+            dict: The new year's 'filtered_growth_rate', 'unfiltered_log_consumption_level'
+                  and 'unfiltered_growth_rate'.
+        """
+        assert year == self._years[-1] + 1, f"Expected year {self._years[-1] + 1}, got {year}"
+        y = np.asarray(asset_returns, dtype=float).reshape(-1)
+        assert len(y) == len(self.asset_names), f"Expected {len(self.asset_names)} returns, got {len(y)}"
+
+        consumption = _real_consumption_per_capita(nondurables, services, prc_index_nondurables,
+                                                   prc_index_services, pop)
+        filtered = np.log(consumption / self._consumption[-1])
+        # ŷₜ = [ĉₜ − (1 − Ω) * Δĉₜ₋₁] / Ω
+        unfiltered_level = (np.log(consumption) - (1 - self.omega) * self._filtered[-1]) / self.omega
+        unfiltered = unfiltered_level - self._unfiltered_level[-1]
+
+        self._years.append(year)
+        self._consumption.append(consumption)
+        self._filtered.append(filtered)
+        self._unfiltered_level.append(unfiltered_level)
+        self._unfiltered.append(unfiltered)
+
+        # an asset with a missing return is no longer priced; its sums are kept but not used
+        self.has_nan |= np.isnan(y)
+        y = np.nan_to_num(y)
+        self.sum_returns += y
+        self.n_periods += 1
+        for branch, x in (('filtered', filtered), ('unfiltered', unfiltered)):
+            if not np.isnan(x):
+                self._update_moments(self._moments[branch], x, y)
+
+        return {
+            'filtered_growth_rate': filtered,
+            'unfiltered_log_consumption_level': unfiltered_level,
+            'unfiltered_growth_rate': unfiltered,
+        }
+
+    def append_many(self,
+                    df_consumption: pd.DataFrame,
+                    df_population: pd.DataFrame,
+                    df_price_index: pd.DataFrame,
+                    df_test_assets: pd.DataFrame) -> pd.DataFrame:
+        """
+        Adds a small batch of new years, given as tables in the layout of the input CSVs.
+
+        Returns:
+            pd.DataFrame: The new years' consumption series, one row per year.
+        """
+        df_population = df_population.set_index('year')
+        df_price_index = df_price_index.set_index('year')
+        df_test_assets = df_test_assets.set_index(df_test_assets.columns[0])
+        rows = {}
+        for year, nondurables, services in df_consumption[['year', 'nondurables', 'services']].itertuples(index=False):
+            rows[year] = self.append(
+                year, nondurables, services,
+                df_price_index.at[year, 'prc_index_nondurables'],
+                df_price_index.at[year, 'prc_index_services'],
+                df_population.at[year, 'pop'],
+                df_test_assets.loc[year, self.asset_names].to_numpy(dtype=float),
+            )
+        return pd.DataFrame.from_dict(rows, orient='index').rename_axis('year').reset_index()
+
+    def consumption_frame(self) -> pd.DataFrame:
+        """The consumption series of all years so far."""
+        return pd.DataFrame({
+            'year': self._years,
+            'total_real_consumption_per_capita': self._consumption,
+            'filtered_growth_rate': self._filtered,
+            'unfiltered_log_consumption_level': self._unfiltered_level,
+            'unfiltered_growth_rate': self._unfiltered,
+        })
+
+    def stage_one(self, branch: str):
+        """
+        Returns:
+            alpha_values (pd.Series), beta_values (pd.Series) of the given branch
+            ('filtered' or 'unfiltered'); assets with missing returns are skipped.
+        """
+        m = self._moments[branch]
+        beta = m['c_xy'] / m['m2_x']
+        alpha = m['mean_y'] - beta * m['mean_x']
+        valid = ~self.has_nan
+        names = self.asset_names[valid]
+        return pd.Series(alpha[valid], index=names), pd.Series(beta[valid], index=names)
+
+    def stage_two(self, branch: str):
+        """
+        Returns:
+            lambda_mean (float), lambda0_mean (float) of the given branch.
+        """
+        _, betas = self.stage_one(branch)
+        avg_returns = self.sum_returns[~self.has_nan] / self.n_periods
+        lambda_mean, lambda0_mean, _ = batched_cross_sectional_ols(betas.to_numpy(), avg_returns)
+        return float(lambda_mean), float(lambda0_mean)
+
+    def check_consistency(self,
+                          df_consumption: pd.DataFrame,
+                          df_population: pd.DataFrame,
+                          df_price_index: pd.DataFrame,
+                          df_test_assets: pd.DataFrame,
+                          rtol: float = 1e-8,
+                          atol: float = 1e-10):
+        """
+        Compares the incremental state with a full recompute on the complete input tables.
+
+        Returns:
+            consistent (bool): Whether all quantities agree within rtol/atol.
+            deviations (pd.Series): Maximum absolute deviation per quantity.
+        """
+        full = OnlineFamaMacBeth(df_consumption, df_population, df_price_index, df_test_assets, self.omega)
+        full_series = full.consumption_frame()
+        series = self.consumption_frame()
+        asset_years = df_test_assets.iloc[:, 0].to_numpy(dtype=np.int64)
+
+        deviations = {}
+        consistent = len(series) == len(full_series)
+        for column in ['filtered_growth_rate', 'unfiltered_log_consumption_level', 'unfiltered_growth_rate']:
+            a, b = series[column].to_numpy(), full_series[column].to_numpy()
+            consistent &= bool(np.allclose(a, b, rtol=rtol, atol=atol, equal_nan=True))
+            deviations[column] = np.nanmax(np.abs(a - b))
+
+        for branch in BRANCHES:
+            # the reference uses the batch implementation with offsets that skip the undefined years
+            factor = full_series[f'{branch}_growth_rate']
+            first_year = full_series['year'][factor.first_valid_index()]
+            startIdx_risk_factor = int(factor.first_valid_index())
+            startIdx_asset = int(np.searchsorted(asset_years, first_year))
+            alphas, betas = stage_one_fama_macbeth(factor, df_test_assets, startIdx_asset, startIdx_risk_factor)
+            # stage two prices the assets that passed stage one, as in prune_extremes
+            priced = df_test_assets[[df_test_assets.columns[0], *betas.index]]
+            lambda_mean, lambda0_mean = stage_two_fama_macbeth(priced, betas)
+
+            online_alphas, online_betas = self.stage_one(branch)
+            online_lambda, online_lambda0 = self.stage_two(branch)
+            for name, a, b in ((f'{branch}_alphas', online_alphas, alphas),
+                               (f'{branch}_betas', online_betas, betas),
+                               (f'{branch}_lambda', online_lambda, lambda_mean),
+                               (f'{branch}_lambda0', online_lambda0, lambda0_mean)):
+                a, b = np.atleast_1d(a), np.atleast_1d(b)
+                consistent &= a.shape == b.shape and bool(np.allclose(a, b, rtol=rtol, atol=atol))
+                deviations[name] = np.max(np.abs(a - b)) if a.shape == b.shape else np.inf
+
+        return consistent, pd.Series(deviations)
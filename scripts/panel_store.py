@@ -0,0 +1,248 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from scripts.fama_macbeth import _masked_time_series_ols, _time_series_ols
+
+
+class PanelStore:
+    """
+    On-disk (T x N) return panel backed by a memory-mapped float array.
+
+    The values are stored column-major, so the returns of a block of assets are one contiguous
+    byte range. Reading a column chunk maps only that range and unmaps it again afterwards,
+    which keeps the resident memory bounded by the chunk size instead of growing with N.
+    A JSON file next to the values holds the period index and the asset-name table.
+
+    Layout of a store directory:
+        values.bin  — raw values, Fortran order, dtype as in meta.json
+        meta.json   — {'dtype', 'periods', 'assets', 'period_column'}
+    """
+
+    VALUES_FILE = 'values.bin'
+    META_FILE = 'meta.json'
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, self.META_FILE)) as f:
+            meta = json.load(f)
+        self.dtype = np.dtype(meta['dtype'])
+        self.periods = np.asarray(meta['periods'])
+        self.assets = pd.Index(meta['assets'])
+        # header of the period column; pandas names the unnamed first column of data/test_assets.csv so
+        self.period_column = meta.get('period_column', 'Unnamed: 0')
+
+    @property
+    def shape(self):
+        return len(self.periods), len(self.assets)
+
+    @property
+    def values_path(self) -> str:
+        return os.path.join(self.directory, self.VALUES_FILE)
+
+    @classmethod
+    def create(cls, directory: str, periods, assets, dtype='float64', period_column: str = 'Unnamed: 0'):
+        """
+        Creates an empty (NaN-filled) store and returns it.
+
+        Args:
+            directory (str): Target directory; created if necessary.
+            periods (array-like): Period labels (e.g. years), one per row.
+            assets (array-like): Asset names, one per column.
+            dtype: Floating point dtype of the stored values.
+            period_column (str): Name of the period column in to_frame.
+        """
+        os.makedirs(directory, exist_ok=True)
+        meta = {
+            'dtype': np.dtype(dtype).str,
+            'periods': np.asarray(periods).tolist(),
+            'assets': [str(a) for a in assets],
+            'period_column': str(period_column),
+        }
+        with open(os.path.join(directory, cls.META_FILE), 'w') as f:
+            json.dump(meta, f)
+        values = np.memmap(os.path.join(directory, cls.VALUES_FILE), dtype=dtype, mode='w+',
+                           shape=(len(periods), len(assets)), order='F')
+        values[:] = np.nan
+        values.flush()
+        del values
+        return cls(directory)
+
+    def memmap(self, mode: str = 'r') -> np.memmap:
+        """Maps the whole (T x N) panel."""
+        return np.memmap(self.values_path, dtype=self.dtype, mode=mode, shape=self.shape, order='F')
+
+    def read_columns(self, start: int, stop: int, mode: str = 'r') -> np.memmap:
+        """Maps only the columns start:stop of the panel."""
+        stop = min(stop, self.shape[1])
+        offset = start * self.shape[0] * self.dtype.itemsize
+        return np.memmap(self.values_path, dtype=self.dtype, mode=mode, offset=offset,
+                         shape=(self.shape[0], stop - start), order='F')
+
+    def iter_column_chunks(self, chunk_size: int = 2048):
+        """
+        Yields (asset_names, values) for consecutive blocks of at most chunk_size assets.
+
+        values is an in-memory (T x chunk) float64 copy; the mapping is released before the next chunk.
+        """
+        for start in range(0, self.shape[1], chunk_size):
+            block = self.read_columns(start, start + chunk_size)
+            values = np.array(block, dtype=float)
+            del block
+            yield self.assets[start:start + chunk_size], values
+
+    def to_frame(self) -> pd.DataFrame:
+        """Loads the panel as pd.read_csv reads the source CSV (first column holds the periods)."""
+        df = pd.DataFrame(np.array(self.memmap()), columns=self.assets)
+        df.insert(0, self.period_column, self.periods)
+        return df
+
+
+def convert_csv_to_panel_store(csv_path: str, directory: str, chunksize: int = 10000, dtype='float64') -> PanelStore:
+    """
+    Converts a return CSV in the layout of data/test_assets.csv into a PanelStore.
+
+    The first column holds the periods and every further column one asset. The CSV is streamed
+    in row chunks, so the full table is never held in memory.
+
+    Args:
+        csv_path (str): Path of the CSV file.
+        directory (str): Target directory of the store.
+        chunksize (int): Number of CSV rows parsed at a time.
+        dtype: Floating point dtype of the stored values.
+
+    Returns:
+        PanelStore: The newly written store.
+    """
+    header = pd.read_csv(csv_path, nrows=0).columns
+    periods = pd.read_csv(csv_path, usecols=[0]).iloc[:, 0].to_numpy()
+    store = PanelStore.create(directory, periods, header[1:], dtype=dtype, period_column=header[0])
+
+    values = store.memmap(mode='r+')
+    row = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize, dtype={name: dtype for name in header[1:]}):
+        n_rows = len(chunk)
+        values[row:row + n_rows] = chunk.iloc[:, 1:].to_numpy(dtype=dtype)
+        row += n_rows
+    values.flush()
+    del values
+    return store
+
+
+def stage_one_fama_macbeth_chunked(df_risk_factor: pd.DataFrame,
+                                   store: PanelStore,
+                                   startIdx_asset,
+                                   startIdx_risk_factor,
+                                   chunk_size: int = 2048,
+                                   min_obs: int = None):
+    """
+    First Fama-MacBeth stage streamed over column chunks of a PanelStore.
+
+    Gives the same results as stage_one_fama_macbeth on the equivalent DataFrame, while only
+    chunk_size assets are held in memory at a time.
+
+    Args:
+        df_risk_factor (pd.DataFrame): Risk factor time series (single column).
+        store (PanelStore): Asset returns; rows are periods, columns are assets.
+        startIdx_asset (int): Starting index to slice asset return time series for alignment.
+        startIdx_risk_factor (int): Starting index to slice risk factor time series for alignment.
+        chunk_size (int): Number of assets per chunk.
+        min_obs (int): Unbalanced-panel mode as in stage_one_fama_macbeth: every asset is regressed
+                       over the periods in which its return and the risk factor are present, and
+                       kept if there are at least min_obs (and at least three) of them.
+
+    Returns:
+        alpha_values (pd.Series): A Series of intercepts (alphas) for each asset.
+        beta_values (pd.Series): A Series of slope coefficients (betas) for each asset.
+    """
+    x = np.asarray(df_risk_factor.values, dtype=float).reshape(-1)[startIdx_risk_factor:]
+    n_periods = store.shape[0] - startIdx_asset
+    assert len(x) == n_periods, f"Length mismatch: {len(x)} vs {n_periods}"
+
+    alphas = []
+    betas = []
+    names = []
+    for chunk_names, values in store.iter_column_chunks(chunk_size):
+        Y = values[startIdx_asset:]
+        if min_obs is None:
+            valid = ~np.isnan(Y).any(axis=0)
+            if np.isnan(x).any():
+                valid[:] = False
+            alpha, beta, _, _, _ = _time_series_ols(x, Y[:, valid])
+        else:
+            # the mask of each chunk only lives as long as the chunk
+            mask = ~np.isnan(Y) & ~np.isnan(x)[:, None]
+            valid = mask.sum(axis=0) >= max(min_obs, 3)
+            alpha, beta, _, _, _ = _masked_time_series_ols(x, Y[:, valid], mask[:, valid])
+        alphas.append(alpha)
+        betas.append(beta)
+        names.append(chunk_names[valid])
+
+    index = names[0].append(names[1:]) if names else pd.Index([])
+    alpha_values = pd.Series(np.concatenate(alphas) if alphas else [], index=index, dtype=float)
+    beta_values = pd.Series(np.concatenate(betas) if betas else [], index=index, dtype=float)
+    return alpha_values, beta_values
+
+
+def stage_two_fama_macbeth_chunked(store: PanelStore,
+                                   betas: pd.Series,
+                                   chunk_size: int = 2048,
+                                   min_assets: int = None):
+    """
+    Second Fama-MacBeth stage streamed over column chunks of a PanelStore.
+
+    The per-period cross-sectional regressions only need the sums n, Σβ, Σβ², Σrₜ and Σβrₜ over
+    the assets with a return in period t, which are accumulated chunk by chunk in O(T) memory.
+    Assets without a beta (e.g. dropped in stage one) are skipped.
+
+    Parameters:
+        store: PanelStore — asset returns (rows: time, columns: assets)
+        betas: pd.Series — factor loadings from stage 1, indexed by asset name
+        chunk_size: int — number of assets per chunk
+        min_assets: int — unbalanced-panel mode as in stage_two_fama_macbeth; if given, every period
+                    is regressed over the priced assets with a return in that period, and kept if
+                    there are at least min_assets (and at least two) of them
+
+    Returns:
+        lambda_mean: float — average price of risk across time
+        lambda0_mean: float — average return for assets not exposed to factor
+    """
+    n_periods = store.shape[0]
+    # only assets with a stage-one beta are priced
+    priced_assets = store.assets.intersection(betas.index, sort=False)
+    # centering the betas keeps Σβ² − (Σβ)²/N numerically stable for large N
+    beta_center = betas[priced_assets].mean()
+    sum_r = np.zeros(n_periods)
+    sum_br = np.zeros(n_periods)
+    has_nan = np.zeros(n_periods, dtype=bool)
+    # per-period sums over the assets present in that period
+    n_assets = np.zeros(n_periods)
+    sum_b = np.zeros(n_periods)
+    sum_bb = np.zeros(n_periods)
+
+    for chunk_names, values in store.iter_column_chunks(chunk_size):
+        priced = chunk_names.isin(betas.index)
+        values = values[:, priced]
+        b = betas[chunk_names[priced]].to_numpy(dtype=float) - beta_center
+        present = ~np.isnan(values)
+        # periods with missing returns are skipped unless min_assets is given
+        has_nan |= ~present.all(axis=1)
+        w = present.astype(float)
+        values = np.nan_to_num(values)
+        sum_r += values.sum(axis=1)
+        sum_br += values @ b
+        n_assets += w.sum(axis=1)
+        sum_b += w @ b
+        sum_bb += w @ (b * b)
+
+    denominator = n_assets * sum_bb - sum_b ** 2
+    if min_assets is None:
+        valid = ~has_nan
+    else:
+        valid = (n_assets >= max(min_assets, 2)) & (denominator > 0)
+    slopes = (n_assets[valid] * sum_br[valid] - sum_b[valid] * sum_r[valid]) / denominator[valid]
+    intercepts = (sum_r[valid] - slopes * sum_b[valid]) / n_assets[valid] - slopes * beta_center
+
+    return np.mean(slopes), np.mean(intercepts)
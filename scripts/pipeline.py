@@ -0,0 +1,94 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from scripts.instrumentation import span
+
+
+class Stage:
+    """
+    A named step of a Pipeline.
+
+    The stage function is called as func(context, **inputs), where inputs maps the name of every
+    dependency to its result. For process pools the function must be defined at module level.
+    """
+
+    def __init__(self, name: str, func, deps=()):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+
+
+def _run_stage(name, func, context, inputs):
+    with span(name, category='stage'):
+        return func(context, **inputs)
+
+
+class Pipeline:
+    """
+    A directed acyclic graph of stages with declared dependencies.
+
+    Stages whose dependencies are finished are submitted to a thread or process pool right away,
+    so independent branches (e.g. the filtered and the unfiltered Fama-MacBeth regressions) run
+    concurrently. A subset of target stages can be selected; only these and their transitive
+    dependencies are run.
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, name: str, func, deps=()):
+        """Adds a stage; all dependencies must have been added before."""
+        if name in self.stages:
+            raise ValueError(f"Stage {name!r} is already defined")
+        missing = [dep for dep in deps if dep not in self.stages]
+        if missing:
+            raise ValueError(f"Stage {name!r} depends on undefined stages {missing}")
+        self.stages[name] = Stage(name, func, deps)
+        return self
+
+    def required(self, targets=None) -> list:
+        """Names of the target stages and their transitive dependencies, in insertion (topological) order."""
+        if targets is None:
+            return list(self.stages)
+        unknown = [t for t in targets if t not in self.stages]
+        if unknown:
+            raise ValueError(f"Unknown stages {unknown}, expected some of {list(self.stages)}")
+        needed = set()
+        todo = list(targets)
+        while todo:
+            name = todo.pop()
+            if name not in needed:
+                needed.add(name)
+                todo.extend(self.stages[name].deps)
+        return [name for name in self.stages if name in needed]
+
+    def run(self, context=None, targets=None, max_workers: int = None, executor: str = 'thread') -> dict:
+        """
+        Runs the selected stages, each as soon as its dependencies are done.
+
+        Args:
+            context: Shared configuration passed as first argument to every stage function.
+            targets (list[str]): Stages to run (with their dependencies). Default runs all stages.
+            max_workers (int): Size of the pool.
+            executor (str): 'thread' or 'process'.
+
+        Returns:
+            dict: Result of every stage that was run, by stage name.
+        """
+        if executor not in ('thread', 'process'):
+            raise ValueError(f"executor must be 'thread' or 'process', got {executor!r}")
+        pending = self.required(targets)
+        results = {}
+        running = {}
+        pool_type = ThreadPoolExecutor if executor == 'thread' else ProcessPoolExecutor
+        with pool_type(max_workers=max_workers) as pool:
+            while pending or running:
+                for name in [n for n in pending if all(dep in results for dep in self.stages[n].deps)]:
+                    stage = self.stages[name]
+                    inputs = {dep: results[dep] for dep in stage.deps}
+                    running[pool.submit(_run_stage, name, stage.func, context, inputs)] = name
+                    pending.remove(name)
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    # re-raises the exception of a failed stage
+                    results[running.pop(future)] = future.result()
+        return results
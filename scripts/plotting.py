@@ -1,8 +1,9 @@
-import matplotlib.pyplot as plt
 import os
-import numpy as np
 import pandas as pd
 
+from scripts.instrumentation import instrumented
+
+@instrumented
 def plot_second_stage_result_from_values(betas: pd.Series,
                                          df_assets: pd.DataFrame,
                                          slope: float,
@@ -20,6 +21,8 @@ def plot_second_stage_result_from_values(betas: pd.Series,
         model_label (str): Label for the model (e.g., 'filtered' or 'unfiltered').
         save_dir (str): Directory to save the plot. Default is 'results'.
     """
+    import matplotlib.pyplot as plt
+
     # Ensure output directory exists
     os.makedirs(save_dir, exist_ok=True)
 
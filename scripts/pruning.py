@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+
+from scripts.instrumentation import instrumented
+
+MODES = ('symmetric', 'lower', 'upper')
+
+
+def _removal_order(betas: np.ndarray, mode: str) -> np.ndarray:
+    # positions of the assets removed at step n = 1, 2, ... (two per step for 'symmetric')
+    order = np.argsort(betas, kind='stable')
+    if mode == 'symmetric':
+        n_steps = len(order) // 2
+        return np.column_stack((order[:n_steps], order[::-1][:n_steps]))
+    if mode == 'lower':
+        return order[:, None]
+    if mode == 'upper':
+        return order[::-1][:, None]
+    raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+
+
+def pruning_mask(betas: pd.Series, n: int, mode: str = 'symmetric') -> np.ndarray:
+    """
+    Boolean mask over betas that drops the n most extreme betas on each pruned side.
+
+    Args:
+        betas (pd.Series): First-stage betas indexed by asset name.
+        n (int): Pruning depth.
+        mode (str): 'symmetric' drops the n smallest and the n largest betas,
+                    'lower' only the n smallest and 'upper' only the n largest.
+    """
+    keep = np.ones(len(betas), dtype=bool)
+    keep[_removal_order(betas.to_numpy(dtype=float), mode)[:n].ravel()] = False
+    return keep
+
+
+@instrumented
+def prune_extremes(betas: pd.Series, df_assets: pd.DataFrame, n: int, mode: str = 'symmetric'):
+    """
+    Drops the assets with the most extreme betas from the betas and the asset returns.
+
+    Returns:
+        pruned_betas (pd.Series): Betas of the remaining assets.
+        pruned_assets (pd.DataFrame): Returns of the remaining assets (first column kept).
+    """
+    keep = pruning_mask(betas, n, mode)
+    pruned_betas = betas[keep]
+    pruned_assets = df_assets[[df_assets.columns[0], *pruned_betas.index]]
+    return pruned_betas, pruned_assets
+
+
+@instrumented
+def pruning_path(betas: pd.Series, df_assets: pd.DataFrame, max_n: int = None, mode: str = 'symmetric'):
+    """
+    Second-stage Fama-MacBeth results for every pruning depth n = 0..max_n.
+
+    The betas are sorted once; going from depth n to n + 1 removes the next extreme assets by
+    downdating the cross-sectional sums Σβ, Σβ², Σrₜ and Σβrₜ (and the per-period count of
+    missing returns) instead of copying the data and rerunning stage two. Each step costs O(T),
+    the whole path O(N·T).
+
+    Args:
+        betas (pd.Series): First-stage betas indexed by asset name.
+        df_assets (pd.DataFrame): Asset returns; the first column holds the periods.
+        max_n (int): Deepest pruning level. Defaults to the deepest level leaving two assets.
+        mode (str): 'symmetric', 'lower' or 'upper', see pruning_mask.
+
+    Returns:
+        pd.DataFrame: Indexed by n, with the columns 'n_assets', 'lambda', 'lambda0' and
+                      'removed' (asset names dropped at that step). Results equal
+                      stage_two_fama_macbeth on the pruned assets, including the rule that
+                      periods with a missing return among the remaining assets are skipped.
+    """
+    names = betas.index
+    b = betas.to_numpy(dtype=float)
+    R = df_assets[names].to_numpy(dtype=float)
+
+    removal = _removal_order(b, mode)
+    per_step = removal.shape[1]
+    deepest = (len(b) - 2) // per_step
+    max_n = deepest if max_n is None else min(max_n, deepest)
+
+    # centering the betas keeps Σβ² − (Σβ)²/N numerically stable
+    center = b.mean()
+    b = b - center
+    missing = np.isnan(R)
+    R = np.where(missing, 0.0, R)
+
+    n_assets = len(b)
+    sum_b = b.sum()
+    sum_bb = b @ b
+    sum_r = R.sum(axis=1)
+    sum_br = R @ b
+    n_missing = missing.sum(axis=1)
+
+    rows = []
+    for n in range(max_n + 1):
+        removed = []
+        if n > 0:
+            # rank-one downdate of the cross-sectional sums for each removed asset
+            for i in removal[n - 1]:
+                n_assets -= 1
+                sum_b -= b[i]
+                sum_bb -= b[i] ** 2
+                sum_r -= R[:, i]
+                sum_br -= b[i] * R[:, i]
+                n_missing -= missing[:, i]
+                removed.append(names[i])
+        valid = n_missing == 0
+        slopes = (n_assets * sum_br[valid] - sum_b * sum_r[valid]) / (n_assets * sum_bb - sum_b ** 2)
+        intercepts = (sum_r[valid] - slopes * sum_b) / n_assets - slopes * center
+        rows.append({
+            'n': n,
+            'n_assets': n_assets,
+            'lambda': np.mean(slopes),
+            'lambda0': np.mean(intercepts),
+            'removed': removed,
+        })
+
+    return pd.DataFrame(rows).set_index('n')
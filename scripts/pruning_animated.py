@@ -1,12 +1,40 @@
-import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
-from matplotlib.animation import FuncAnimation
 
-from scripts.fama_macbeth import stage_two_fama_macbeth
+from scripts.instrumentation import instrumented
 
 
-def generate_pruning_animation(pruned_betas_list, pruned_assets_list):
+def pruning_animation_frames(pruned_betas_list, pruned_assets_list, exposures, lambda0s):
+    """
+    Precomputes the data of every animation frame, so no regression runs inside the animation.
+
+    Args:
+        pruned_betas_list (list[pd.Series]): Betas after pruning 1, 2, ... outliers.
+        pruned_assets_list (list[pd.DataFrame]): The corresponding asset returns.
+        exposures (list[float]): Second-stage slopes of the pruned cross-sections (e.g. from pruning_path).
+        lambda0s (list[float]): Second-stage intercepts of the pruned cross-sections.
+
+    Returns:
+        list[dict]: One dict per frame with the entries 'x', 'y', 'lambda' and 'lambda0'.
+    """
+    frames = []
+    for betas, assets, exposure, lambda0 in zip(pruned_betas_list, pruned_assets_list, exposures, lambda0s):
+        # Compute average returns (excluding the first column if not an asset)
+        avg_returns = assets.iloc[:, 1:].mean()
+        asset_names = avg_returns.index
+        frames.append({
+            'x': betas[asset_names].to_numpy(dtype=float),
+            'y': avg_returns.to_numpy(dtype=float),
+            'lambda': float(exposure),
+            'lambda0': float(lambda0),
+        })
+    return frames
+
+
+@instrumented
+def generate_pruning_animation(frames, filename="results/regression_pruning.gif"):
+    import matplotlib.pyplot as plt
+    from matplotlib.animation import FuncAnimation
+
     fig, ax = plt.subplots(figsize=(6, 5))
     scatter = ax.scatter([], [], color='black', s=30)
     line, = ax.plot([], [], color='crimson', linestyle='-')
@@ -25,25 +53,14 @@ def generate_pruning_animation(pruned_betas_list, pruned_assets_list):
     ax.set_ylabel("Average Return")
 
     def update(frame):
-        betas = pruned_betas_list[frame]
-        assets = pruned_assets_list[frame]
-
-        # Regression
-        pruned_exposure, pruned_lambda0  = stage_two_fama_macbeth(assets, betas)
-
-        # Compute average returns (excluding the first column if not an asset)
-        avg_returns = assets.iloc[:, 1:].mean()
-        asset_names = avg_returns.index
-
-        x = betas[asset_names].values
-        y = avg_returns.values
+        data = frames[frame]
 
         # Update scatter
-        scatter.set_offsets(np.column_stack((x, y)))
+        scatter.set_offsets(np.column_stack((data['x'], data['y'])))
 
         # Update regression line
         x_line = np.array(x_limit)
-        y_line = pruned_lambda0 + pruned_exposure * x_line
+        y_line = data['lambda0'] + data['lambda'] * x_line
         line.set_data(x_line, y_line)
 
         # Update title
@@ -73,8 +90,9 @@ def generate_pruning_animation(pruned_betas_list, pruned_assets_list):
 
     ax.grid(False)
     # Create animation
-    anim = FuncAnimation(fig, update, frames=len(pruned_betas_list), interval=2000, blit=True)
+    anim = FuncAnimation(fig, update, frames=len(frames), interval=2000, blit=True)
 
     # Or save to GIF
-    anim.save("results/regression_pruning.gif", writer='pillow', fps=1)
-    print("GIF saved as regression_pruning.gif")
\ No newline at end of file
+    anim.save(filename, writer='pillow', fps=1)
+    plt.close(fig)
+    print(f"GIF saved as {filename}")
\ No newline at end of file
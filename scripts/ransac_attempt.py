@@ -1,31 +1,33 @@
 import os
 
 import numpy as np
-import matplotlib.pyplot as plt
-from sklearn.linear_model import RANSACRegressor, LinearRegression
 
+from scripts.instrumentation import instrumented
+from scripts.robust_line import ransac_line
+
+
+def apply_ransac(x, y, name, residual_threshold=2, save_dir="results"):
+    # Fit RANSAC (all candidate lines through pairs of points are scored at once)
+    fit = ransac_line(x, y, residual_threshold)
+    plot_ransac_fit(x, y, fit['inlier_mask'], fit['slope'], fit['intercept'], name, save_dir)
+    return fit
 
-def apply_ransac(x, y, name):
-    # Ensure inputs are NumPy arrays
-    x = np.asarray(x).reshape(-1, 1)  # Convert x to shape (n_samples, 1)
-    y = np.asarray(y)  # y can remain 1D
 
-    # Fit RANSAC
-    ransac = RANSACRegressor(
-        estimator=LinearRegression(),
-        residual_threshold=2,  # try increasing or decreasing this
-        random_state=42
-    )
-    ransac.fit(x, y)
-    # Get the inlier mask
-    inlier_mask = ransac.inlier_mask_
+@instrumented
+def plot_ransac_fit(x, y, inlier_mask, slope, intercept, name, save_dir="results"):
+    import matplotlib.pyplot as plt
+
+    # Ensure inputs are NumPy arrays
+    x = np.asarray(x)
+    y = np.asarray(y)
+    inlier_mask = np.asarray(inlier_mask, dtype=bool)
     outlier_mask = ~inlier_mask
 
     x_limit = (-100, 300)
     y_limit = (-2, 22)
     # Get line for plotting
-    line_x = np.linspace(x_limit[0], x_limit[1], 100).reshape(-1, 1)
-    line_y = ransac.predict(line_x)
+    line_x = np.linspace(x_limit[0], x_limit[1], 100)
+    line_y = intercept + slope * line_x
 
     # Plot
     fig, ax = plt.subplots(figsize=(6, 5))
@@ -60,7 +62,7 @@ def apply_ransac(x, y, name):
     ax.plot(line_x, line_y, color='crimson', linestyle= '-', label='RANSAC Fit')
     plt.title("RANSAC Regression")
     ax.legend()
-    filename = os.path.join("results", name)
+    filename = os.path.join(save_dir, name)
     plt.tight_layout()
     plt.savefig(filename, bbox_inches='tight')
     plt.close()
\ No newline at end of file
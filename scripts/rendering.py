@@ -0,0 +1,60 @@
+import importlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from scripts.instrumentation import instrumented
+
+# figure kinds and the plotting functions that draw them; imported only when a figure is rendered
+FIGURE_KINDS = {
+    'second_stage': 'scripts.plotting:plot_second_stage_result_from_values',
+    'pruning_animation': 'scripts.pruning_animated:generate_pruning_animation',
+    'ransac': 'scripts.ransac_attempt:plot_ransac_fit',
+}
+
+
+def figure_spec(kind: str, **kwargs) -> dict:
+    """
+    Describes a figure as plain data: its kind and the keyword arguments of its plotting function.
+
+    Specs hold only precomputed numbers (arrays, Series, floats, strings), so they can be sent
+    to worker processes and rendered without rerunning any regression.
+    """
+    if kind not in FIGURE_KINDS:
+        raise ValueError(f"Unknown figure kind {kind!r}, expected one of {sorted(FIGURE_KINDS)}")
+    return {'kind': kind, 'kwargs': kwargs}
+
+
+def _use_agg():
+    # non-interactive backend; must be selected before pyplot is imported
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def render_figure(spec: dict):
+    """Renders one figure spec with the Agg backend."""
+    _use_agg()
+    module_name, function_name = FIGURE_KINDS[spec['kind']].split(':')
+    plot = getattr(importlib.import_module(module_name), function_name)
+    plot(**spec['kwargs'])
+
+
+@instrumented
+def render_figures(specs, max_workers: int = None):
+    """
+    Renders figure specs, in parallel on a process pool if there is more than one.
+
+    Args:
+        specs (list[dict]): Figure specs created with figure_spec.
+        max_workers (int): Number of worker processes. Defaults to one per figure, capped at the CPU count.
+    """
+    specs = list(specs)
+    if not specs:
+        return
+    max_workers = max_workers or min(len(specs), os.cpu_count() or 1)
+    if max_workers == 1 or len(specs) == 1:
+        for spec in specs:
+            render_figure(spec)
+        return
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_use_agg) as pool:
+        # consume the iterator so errors in workers are raised here
+        list(pool.map(render_figure, specs))
@@ -0,0 +1,195 @@
+import numpy as np
+
+from scripts.instrumentation import instrumented
+
+# budget for the (hypotheses x assets) residual block evaluated at once
+_CHUNK_ELEMENTS = 2 ** 22
+
+
+def candidate_lines(x: np.ndarray, y: np.ndarray, max_hypotheses: int = 20000, random_state=42):
+    """
+    Lines through pairs of points, the minimal samples of a single-regressor RANSAC.
+
+    All C(N, 2) pairs are used if there are at most max_hypotheses of them; otherwise
+    max_hypotheses distinct-point pairs are drawn at random.
+
+    Args:
+        x (np.ndarray): Regressor (e.g. betas) of shape (..., N).
+        y (np.ndarray): Dependent variable (e.g. average returns) of shape (..., N).
+        max_hypotheses (int): Maximum number of candidate lines.
+        random_state: Seed or np.random.Generator for sampled pairs.
+
+    Returns:
+        slopes (np.ndarray): Shape (..., H); NaN for pairs with equal x.
+        intercepts (np.ndarray): Shape (..., H).
+    """
+    n = x.shape[-1]
+    if n * (n - 1) // 2 <= max_hypotheses:
+        i, j = np.triu_indices(n, 1)
+    else:
+        rng = np.random.default_rng(random_state)
+        i = rng.integers(0, n, size=max_hypotheses)
+        j = rng.integers(0, n - 1, size=max_hypotheses)
+        j += j >= i
+    dx = x[..., j] - x[..., i]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slopes = np.where(dx != 0, (y[..., j] - y[..., i]) / dx, np.nan)
+    intercepts = y[..., i] - slopes * x[..., i]
+    return slopes, intercepts
+
+
+def _count_at_most(sorted_rows: np.ndarray, thresholds: np.ndarray) -> np.ndarray:
+    # vectorized binary search: number of entries <= each threshold in every sorted row;
+    # thresholds has the leading shape of sorted_rows and one threshold per entry of its last axis
+    shape = thresholds.shape
+    lo = np.zeros(shape, dtype=np.int64)
+    hi = np.full(shape, sorted_rows.shape[-1], dtype=np.int64)
+    while np.any(lo < hi):
+        mid = (lo + hi) // 2
+        value = np.take_along_axis(sorted_rows, np.minimum(mid, sorted_rows.shape[-1] - 1), axis=-1)
+        right = (value <= thresholds) & (lo < hi)
+        lo = np.where(right, mid + 1, lo)
+        hi = np.where(right | (lo >= hi), hi, mid)
+    return lo
+
+
+def _masked_ols(x: np.ndarray, y: np.ndarray, mask: np.ndarray):
+    # closed-form OLS of y on x over the entries where mask is True, along the last axis
+    w = mask.astype(float)
+    n = w.sum(axis=-1)
+    sx = (w * x).sum(axis=-1)
+    sy = (w * y).sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (n * (w * x * y).sum(axis=-1) - sx * sy) / (n * (w * x * x).sum(axis=-1) - sx ** 2)
+        intercept = (sy - slope * sx) / n
+    return slope, intercept
+
+
+@instrumented
+def ransac_line(x, y, residual_thresholds=2.0, max_hypotheses: int = 20000, random_state=42):
+    """
+    Batched RANSAC fit of a line y = intercept + slope * x, e.g. the security market line of stage two.
+
+    All candidate lines are scored at once as a residual matrix, and a whole grid of residual
+    thresholds is evaluated in the same pass. For each threshold the candidate with the most
+    inliers wins (ties are broken by the smaller sum of squared inlier residuals), and the line
+    is refit by OLS on its inliers. Leading axes of x and y are treated as independent problems,
+    e.g. several universes or Omegas.
+
+    Args:
+        x (array-like): Regressor of shape (..., N).
+        y (array-like): Dependent variable of shape (..., N).
+        residual_thresholds (float or array-like): Maximum absolute residual of an inlier; a scalar or a grid (G,).
+        max_hypotheses (int): Maximum number of candidate lines, see candidate_lines.
+        random_state: Seed or np.random.Generator for sampled pairs.
+
+    Returns:
+        dict with the entries
+            'slope', 'intercept': OLS refit on the inliers, shape (..., G)
+            'inlier_mask': inliers of the winning candidate, shape (..., G, N)
+            'n_inliers': number of inliers, shape (..., G)
+        The G axis is dropped if residual_thresholds is a scalar.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    thresholds = np.asarray(residual_thresholds, dtype=float)
+    scalar = thresholds.ndim == 0
+    thresholds = thresholds.reshape(-1)
+
+    slopes, intercepts = candidate_lines(x, y, max_hypotheses, random_state)
+    batch_shape = slopes.shape[:-1]
+    n_hypotheses = slopes.shape[-1]
+    n_grid = len(thresholds)
+
+    best_count = np.full(batch_shape + (n_grid,), -1)
+    best_sse = np.full(batch_shape + (n_grid,), np.inf)
+    best_slope = np.full(batch_shape + (n_grid,), np.nan)
+    best_intercept = np.full(batch_shape + (n_grid,), np.nan)
+
+    batch_size = int(np.prod(batch_shape, dtype=np.int64))
+    chunk = max(1, _CHUNK_ELEMENTS // max(1, batch_size * x.shape[-1]))
+    for start in range(0, n_hypotheses, chunk):
+        s = slopes[..., start:start + chunk]
+        c = intercepts[..., start:start + chunk]
+        resid = np.abs(y[..., None, :] - c[..., None] - s[..., None] * x[..., None, :])  # (..., h, N)
+        # sorting the residuals once serves every threshold: the inliers are a prefix of each row
+        resid = np.sort(np.nan_to_num(resid), axis=-1)
+        cum_sse = np.cumsum(resid ** 2, axis=-1)
+        counts = _count_at_most(resid, np.broadcast_to(thresholds, resid.shape[:-1] + (n_grid,)))  # (..., h, G)
+        sse = np.where(counts > 0, np.take_along_axis(cum_sse, np.maximum(counts - 1, 0), axis=-1), 0.0)
+        counts[np.isnan(s)] = -1
+
+        # best candidate of this chunk: most inliers, then smallest inlier SSE
+        top = counts.max(axis=-2, keepdims=True)
+        pick = np.argmin(np.where(counts == top, sse, np.inf), axis=-2)  # (..., G)
+        chunk_count = np.take_along_axis(counts, pick[..., None, :], axis=-2)[..., 0, :]
+        chunk_sse = np.take_along_axis(sse, pick[..., None, :], axis=-2)[..., 0, :]
+        better = (chunk_count > best_count) | ((chunk_count == best_count) & (chunk_sse < best_sse))
+        best_count = np.where(better, chunk_count, best_count)
+        best_sse = np.where(better, chunk_sse, best_sse)
+        best_slope = np.where(better, np.take_along_axis(s, pick, axis=-1), best_slope)
+        best_intercept = np.where(better, np.take_along_axis(c, pick, axis=-1), best_intercept)
+
+    resid = np.abs(y[..., None, :] - best_intercept[..., None] - best_slope[..., None] * x[..., None, :])
+    inlier_mask = resid <= thresholds[:, None]  # (..., G, N)
+    slope, intercept = _masked_ols(x[..., None, :], y[..., None, :], inlier_mask)
+
+    result = {
+        'slope': slope,
+        'intercept': intercept,
+        'inlier_mask': inlier_mask,
+        'n_inliers': inlier_mask.sum(axis=-1),
+    }
+    if scalar:
+        result = {name: value[..., 0, :] if name == 'inlier_mask' else value[..., 0]
+                  for name, value in result.items()}
+    return result
+
+
+def lmeds_line(x, y, max_hypotheses: int = 20000, random_state=42):
+    """
+    Batched least-median-of-squares fit of a line y = intercept + slope * x.
+
+    The candidate with the smallest median squared residual wins. Inliers are the points within
+    2.5 robust standard deviations (Rousseeuw's finite-sample scale), and the line is refit by
+    OLS on them. Leading axes of x and y are treated as independent problems.
+
+    Args:
+        x (array-like): Regressor of shape (..., N).
+        y (array-like): Dependent variable of shape (..., N).
+        max_hypotheses (int): Maximum number of candidate lines, see candidate_lines.
+        random_state: Seed or np.random.Generator for sampled pairs.
+
+    Returns:
+        dict with the entries 'slope', 'intercept' (shape (...)), 'inlier_mask' (shape (..., N))
+        and 'n_inliers' (shape (...)).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = x.shape[-1]
+
+    slopes, intercepts = candidate_lines(x, y, max_hypotheses, random_state)
+    batch_size = int(np.prod(slopes.shape[:-1], dtype=np.int64))
+    chunk = max(1, _CHUNK_ELEMENTS // max(1, batch_size * n))
+
+    medians = []
+    for start in range(0, slopes.shape[-1], chunk):
+        s = slopes[..., start:start + chunk, None]
+        c = intercepts[..., start:start + chunk, None]
+        medians.append(np.median((y[..., None, :] - c - s * x[..., None, :]) ** 2, axis=-1))
+    medians = np.concatenate(medians, axis=-1)
+    medians[np.isnan(slopes)] = np.inf
+
+    pick = np.argmin(medians, axis=-1)[..., None]
+    best_slope = np.take_along_axis(slopes, pick, axis=-1)
+    best_intercept = np.take_along_axis(intercepts, pick, axis=-1)
+    scale = 1.4826 * (1 + 5 / max(n - 2, 1)) * np.sqrt(np.take_along_axis(medians, pick, axis=-1))
+
+    inlier_mask = np.abs(y - best_intercept - best_slope * x) <= 2.5 * scale
+    slope, intercept = _masked_ols(x, y, inlier_mask)
+    return {
+        'slope': slope,
+        'intercept': intercept,
+        'inlier_mask': inlier_mask,
+        'n_inliers': inlier_mask.sum(axis=-1),
+    }
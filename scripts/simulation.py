@@ -0,0 +1,162 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from scripts.fama_macbeth import batched_cross_sectional_ols, batched_time_series_ols
+from scripts.unfiltering import unfilter_log_consumption
+
+# the unfiltered growth rate is NaN in the first three periods; both branches are estimated from here on
+_FIRST_PERIOD = 3
+BRANCHES = ('filtered', 'unfiltered')
+
+
+def nipa_filter(log_level: np.ndarray, omega: float) -> np.ndarray:
+    """
+    Applies the NIPA-style filter ĉₜ = Ω yₜ + (1 − Ω) Δĉₜ₋₁ to true log consumption levels yₜ.
+
+    This is the inverse of unfilter_log_consumption: unfiltering the result with the same Ω
+    returns yₜ from the third period on. The recursion runs over time only; all other axes
+    (e.g. simulated economies) are filtered at once. The first two periods carry no lagged
+    growth and are set to Ω yₜ.
+
+    Args:
+        log_level (np.ndarray): True log consumption levels of shape (T,) or (T, R).
+        omega (float): Filter parameter Ω in (0, 1].
+
+    Returns:
+        np.ndarray: Filtered log consumption levels of the same shape.
+    """
+    filtered = omega * np.asarray(log_level, dtype=float)
+    for t in range(2, len(filtered)):
+        filtered[t] += (1 - omega) * (filtered[t - 1] - filtered[t - 2])
+    return filtered
+
+
+def _simulate_chunk(args):
+    (seed_sequence, n_reps, n_years, betas, lambda_, lambda0, growth_mean, growth_std,
+     resid_std, omega, omega_assumed) = args
+    rng = np.random.default_rng(seed_sequence)
+
+    # true consumption growth and log levels, time first: (T, R)
+    growth = rng.normal(growth_mean, growth_std, (n_years, n_reps))
+    log_level = np.log(550) + np.cumsum(growth, axis=0)
+
+    # what the statistical agency publishes, and what main.py derives from it
+    filtered_level = nipa_filter(log_level, omega)
+    filtered_growth = np.full_like(filtered_level, np.nan)
+    filtered_growth[1:] = np.diff(filtered_level, axis=0)
+    _, unfiltered_growth = unfilter_log_consumption(np.exp(filtered_level), filtered_growth, omega_assumed)
+
+    # returns priced by the true growth: E[rᵢ] = λ0 + βᵢ λ; shape (R, T, N)
+    shocks = (growth - growth_mean).T
+    returns = (lambda0 + lambda_ * betas + shocks[:, :, None] * betas +
+               rng.normal(0, resid_std, (n_reps, n_years, len(betas))))
+
+    Y = returns[:, _FIRST_PERIOD:]
+    avg_returns = Y.mean(axis=1)
+    estimates = []
+    for factor in (filtered_growth, unfiltered_growth):
+        _, beta_hat = batched_time_series_ols(factor[_FIRST_PERIOD:].T, Y)
+        lambda_mean, lambda0_mean, _ = batched_cross_sectional_ols(beta_hat, avg_returns)
+        estimates += [lambda_mean, lambda0_mean]
+    return np.column_stack(estimates)
+
+
+def monte_carlo_fama_macbeth(n_reps: int = 10000,
+                             n_years: int = 90,
+                             n_assets: int = 25,
+                             betas=None,
+                             lambda_: float = 0.03,
+                             lambda0: float = 10.0,
+                             growth_mean: float = 0.02,
+                             growth_std: float = 0.02,
+                             resid_std: float = 20.0,
+                             omega: float = 0.46,
+                             omega_assumed: float = None,
+                             chunk_size: int = 1000,
+                             seed: int = 42,
+                             max_workers: int = None,
+                             parallel_threshold: int = 50000):
+    """
+    Monte Carlo study of the filtered and unfiltered Fama-MacBeth estimates of main.py.
+
+    Every replication is an artificial economy: true consumption growth is drawn, filtered with
+    a known Omega (nipa_filter), unfiltered again with unfilter_log_consumption, and test asset
+    returns are generated with known prices of risk on the true growth. Both Fama-MacBeth stages
+    are then run with the filtered and the unfiltered growth rate as the factor.
+
+    Replications are an extra array axis: chunks of chunk_size economies are simulated and
+    estimated in one pass of batched_time_series_ols and batched_cross_sectional_ols, which
+    bounds the memory to one (chunk_size, T, N) return block. Each chunk gets its own child of
+    one SeedSequence, so the draws do not depend on how the chunks are spread over the process pool.
+
+    Args:
+        n_reps (int): Number of simulated economies.
+        n_years (int): Number of years T per economy.
+        n_assets (int): Number of test assets N; ignored if betas are given.
+        betas (array-like): True betas of the test assets on consumption growth. Defaults to draws
+                            of the magnitude of the 25 Fama-French portfolios, fixed across replications.
+        lambda_ (float): True price of consumption risk.
+        lambda0 (float): True zero-beta rate (cross-sectional intercept).
+        growth_mean (float): Mean of the true log consumption growth.
+        growth_std (float): Standard deviation of the true log consumption growth.
+        resid_std (float): Standard deviation of the idiosyncratic return shocks.
+        omega (float): Omega of the filter that generates the published data.
+        omega_assumed (float): Omega used for unfiltering. Defaults to omega; other values show the
+                               effect of a misspecified filter.
+        chunk_size (int): Number of economies per vectorized chunk.
+        seed (int): Seed of the root SeedSequence.
+        max_workers (int): Number of worker processes. Default uses all CPUs.
+        parallel_threshold (int): Minimum number of replications for which the process pool is used.
+
+    Returns:
+        dict with the entries
+            'summary': pd.DataFrame — indexed by (branch, parameter); columns 'true', 'mean',
+                       'bias', 'std' and 'rmse' of lambda and lambda0 per branch
+            'distribution': pd.DataFrame — one row per replication; columns e.g. 'unfiltered_lambda'
+            'betas': np.ndarray — the true betas
+
+    Notes:
+        - Both stages use the periods from the fourth year on, where the unfiltered growth rate
+          is defined, for both branches.
+        - The filtered branch measures the price of risk of the filtered factor; its bias relative to
+          the true lambda is the distortion that unfiltering is meant to remove.
+    """
+    assert 0 < omega <= 1, "Omega must lie in (0, 1]"
+    omega_assumed = omega if omega_assumed is None else omega_assumed
+    assert n_years > _FIRST_PERIOD + 2, "Too few years for the unfiltered growth rate"
+
+    children = np.random.SeedSequence(seed).spawn(1 + -(-n_reps // chunk_size))
+    if betas is None:
+        betas = np.random.default_rng(children[0]).normal(100, 80, n_assets)
+    betas = np.asarray(betas, dtype=float).reshape(-1)
+
+    chunk_sizes = [min(chunk_size, n_reps - i) for i in range(0, n_reps, chunk_size)]
+    tasks = [(s, n, n_years, betas, lambda_, lambda0, growth_mean, growth_std, resid_std, omega, omega_assumed)
+             for s, n in zip(children[1:], chunk_sizes)]
+    if n_reps >= parallel_threshold and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+            draws = np.concatenate(list(pool.map(_simulate_chunk, tasks)))
+    else:
+        draws = np.concatenate([_simulate_chunk(task) for task in tasks])
+
+    columns = [f'{branch}_{parameter}' for branch in BRANCHES for parameter in ('lambda', 'lambda0')]
+    distribution = pd.DataFrame(draws, columns=columns)
+
+    truth = np.tile([lambda_, lambda0], len(BRANCHES))
+    errors = draws - truth
+    summary = pd.DataFrame({
+        'true': truth,
+        'mean': draws.mean(axis=0),
+        'bias': errors.mean(axis=0),
+        'std': draws.std(axis=0, ddof=1),
+        'rmse': np.sqrt(np.mean(errors ** 2, axis=0)),
+    }, index=pd.MultiIndex.from_product([BRANCHES, ['lambda', 'lambda0']], names=['branch', 'parameter']))
+
+    return {
+        'summary': summary,
+        'distribution': distribution,
+        'betas': betas,
+    }
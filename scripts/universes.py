@@ -0,0 +1,159 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from scripts.fama_macbeth import stage_two_fama_macbeth
+
+# fewer common years of a universe and a factor do not identify a beta and its standard error
+MIN_COMMON_YEARS = 3
+
+# estimates reported per universe and branch, next to n_assets and n_periods
+RESULT_COLUMNS = ('lambda', 'lambda0', 'r2', 'lambda_t_stat', 'lambda_shanken_t_stat', 'lambda_hac_t_stat',
+                  'lambda0_t_stat')
+
+# factor panel of the current process: (years, values (T, B), branch names); set by _attach_factors
+_factors = None
+_shm = None
+
+
+def _attach_factors(shm_name, shape, dtype, years, names):
+    # pool initializer: map the parent's shared factor block instead of receiving a pickled copy
+    global _factors, _shm
+    _shm = shared_memory.SharedMemory(name=shm_name)
+    _factors = (years, np.ndarray(shape, dtype=dtype, buffer=_shm.buf), names)
+
+
+def factor_design(factor_years: np.ndarray, F: np.ndarray, universe_years: np.ndarray) -> dict:
+    """
+    Stage-one design statistics of every factor for the periods of one universe.
+
+    A factor value is paired with the returns of the same year, over the years in which both
+    are available, which matches the start offsets used in main.py.
+
+    Returns:
+        dict: Per factor column k a tuple (factor_rows, asset_rows, x_mean, sxx) with the
+              positions into factor_years and universe_years, the factor mean and the sum of
+              squared deviations over the window; None if the universe shares fewer than
+              MIN_COMMON_YEARS years with the factor.
+    """
+    position = {year: i for i, year in enumerate(factor_years)}
+    design = {}
+    for k in range(F.shape[1]):
+        pairs = [(position[year], i) for i, year in enumerate(universe_years)
+                 if year in position and not np.isnan(F[position[year], k])]
+        if len(pairs) < MIN_COMMON_YEARS:
+            design[k] = None
+            continue
+        factor_rows, asset_rows = np.array(pairs, dtype=np.int64).T
+        x = F[factor_rows, k]
+        design[k] = (factor_rows, asset_rows, x.mean(), np.sum((x - x.mean()) ** 2))
+    return design
+
+
+def _evaluate_universe(args):
+    name, df_assets, design = args
+    if isinstance(df_assets, str):
+        df_assets = pd.read_csv(df_assets)
+    _, F, branches = _factors
+    asset_names = df_assets.columns[1:]
+    returns = df_assets[asset_names].to_numpy(dtype=float)
+
+    rows = []
+    for k, branch in enumerate(branches):
+        if design[k] is None:
+            # no overlap with this factor: the universe cannot be priced, the others still are
+            rows.append({'universe': name, 'branch': branch, 'n_assets': 0, 'n_periods': 0,
+                         **{column: np.nan for column in RESULT_COLUMNS}})
+            continue
+        factor_rows, asset_rows, x_mean, sxx = design[k]
+        x_dev = F[factor_rows, k] - x_mean
+        Y = returns[asset_rows]
+        # stage one with the shared design: one matrix-vector product for all assets
+        valid = ~np.isnan(Y).any(axis=0)
+        betas = pd.Series(x_dev @ Y[:, valid] / sxx, index=asset_names[valid])
+
+        priced = df_assets[[df_assets.columns[0], *betas.index]]
+        lambda_mean, lambda0_mean, stats = stage_two_fama_macbeth(priced, betas, return_stats=True,
+                                                                  risk_factor=F[factor_rows, k])
+        summary = stats['summary']
+        rows.append({
+            'universe': name,
+            'branch': branch,
+            'n_assets': len(betas),
+            'n_periods': len(stats['lambdas']),
+            'lambda': lambda_mean,
+            'lambda0': lambda0_mean,
+            'r2': stats['r2'],
+            'lambda_t_stat': summary.at['lambda', 't_stat'],
+            'lambda_shanken_t_stat': summary.at['lambda', 'shanken_t_stat'],
+            'lambda_hac_t_stat': summary.at['lambda', 'hac_t_stat'],
+            'lambda0_t_stat': summary.at['lambda0', 't_stat'],
+        })
+    return rows
+
+
+def evaluate_universes(factors: pd.DataFrame,
+                       universes: dict,
+                       max_workers: int = None,
+                       parallel_threshold: int = 2):
+    """
+    Prices many test-asset universes against the same consumption factors.
+
+    The factor panel and the design statistics of every distinct universe period range are
+    computed once in the parent. Universes are fanned out over a process pool whose workers map
+    the factor panel from shared memory; universes given as CSV paths are also read in the workers.
+
+    Args:
+        factors (pd.DataFrame): Factor series indexed by year, one column per branch
+                                (e.g. 'filtered' and 'unfiltered' consumption growth).
+        universes (dict): Universe name -> asset return DataFrame (first column holds the years)
+                          or path to a CSV file in the layout of data/test_assets.csv.
+        max_workers (int): Number of worker processes. Default uses all CPUs.
+        parallel_threshold (int): Minimum number of universes for which the process pool is used.
+
+    Returns:
+        pd.DataFrame: Comparison table indexed by (universe, branch) with the columns 'n_assets',
+                      'n_periods', 'lambda', 'lambda0', 'r2' and the t-statistics of lambda
+                      (Fama-MacBeth, Shanken, HAC) and lambda0. A universe sharing fewer than
+                      MIN_COMMON_YEARS years with a factor gets n_periods 0 and NaN estimates.
+    """
+    global _factors
+    factor_years = factors.index.to_numpy(dtype=np.int64)
+    F = np.ascontiguousarray(factors.to_numpy(dtype=float))
+    branches = list(factors.columns)
+
+    # design statistics are shared by all universes covering the same years
+    designs = {}
+    tasks = []
+    for name, source in universes.items():
+        if isinstance(source, str):
+            universe_years = pd.read_csv(source, usecols=[0]).iloc[:, 0].to_numpy(dtype=np.int64)
+        else:
+            universe_years = source.iloc[:, 0].to_numpy(dtype=np.int64)
+        key = universe_years.tobytes()
+        if key not in designs:
+            designs[key] = factor_design(factor_years, F, universe_years)
+        tasks.append((name, source, designs[key]))
+
+    max_workers = max_workers or os.cpu_count()
+    if len(tasks) >= parallel_threshold and max_workers > 1:
+        shm = shared_memory.SharedMemory(create=True, size=max(F.nbytes, 1))
+        try:
+            np.ndarray(F.shape, dtype=F.dtype, buffer=shm.buf)[:] = F
+            with ProcessPoolExecutor(max_workers=min(max_workers, len(tasks)), initializer=_attach_factors,
+                                     initargs=(shm.name, F.shape, F.dtype, factor_years, branches)) as pool:
+                parts = list(pool.map(_evaluate_universe, tasks))
+        finally:
+            shm.close()
+            shm.unlink()
+    else:
+        _factors = (factor_years, F, branches)
+        try:
+            parts = [_evaluate_universe(task) for task in tasks]
+        finally:
+            _factors = None
+
+    return pd.DataFrame([row for part in parts for row in part]).set_index(['universe', 'branch'])
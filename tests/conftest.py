@@ -0,0 +1,18 @@
+import pytest
+
+import main
+from scripts.data_loading import load_inputs
+
+
+@pytest.fixture(scope='session')
+def load():
+    """The input tables of data/, aligned by the loader."""
+    ctx = {'data_dir': 'data'}
+    return load_inputs(dict(zip(main.INPUT_FILES, main.input_paths(ctx))))
+
+
+@pytest.fixture(scope='session')
+def df_solution(load):
+    """The consumption table of main.py with the filtered and unfiltered growth rates."""
+    ctx = {'omega': main.omega}
+    return main.unfiltering(ctx, main.filtered_growth(ctx, main.real_consumption(ctx, load)))
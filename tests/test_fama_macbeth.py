@@ -0,0 +1,160 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import linregress
+
+from scripts.fama_macbeth import stage_one_fama_macbeth, stage_two_fama_macbeth
+
+
+@pytest.fixture(scope='module')
+def inputs(load, df_solution):
+    """Test assets and the unfiltered consumption growth of main.py, aligned like its stage one."""
+    startIdx_asset, startIdx_risk_factor = load.fama_macbeth_offsets(3)
+    return df_solution['unfiltered_growth_rate'], load.test_assets, startIdx_asset, startIdx_risk_factor
+
+
+def linregress_stage_one(factor, df_assets, startIdx_asset, startIdx_risk_factor):
+    # the per-asset loop that stage_one_fama_macbeth replaces
+    x = factor.to_numpy()[startIdx_risk_factor:]
+    rows = {}
+    for name in df_assets.columns[1:]:
+        y = df_assets[name].to_numpy()[startIdx_asset:]
+        if np.isnan(y).any():
+            continue
+        fit = linregress(x, y)
+        rows[name] = {'alpha': fit.intercept, 'beta': fit.slope,
+                      'alpha_se': fit.intercept_stderr, 'beta_se': fit.stderr}
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+
+def assert_parity(factor, df_assets, startIdx_asset, startIdx_risk_factor):
+    expected = linregress_stage_one(factor, df_assets, startIdx_asset, startIdx_risk_factor)
+    alpha, beta, stats = stage_one_fama_macbeth(factor, df_assets, startIdx_asset, startIdx_risk_factor,
+                                                return_stats=True)
+    assert list(beta.index) == list(expected.index)
+    np.testing.assert_allclose(alpha, expected['alpha'], rtol=1e-10)
+    np.testing.assert_allclose(beta, expected['beta'], rtol=1e-10)
+    np.testing.assert_allclose(stats['alpha_se'], expected['alpha_se'], rtol=1e-10)
+    np.testing.assert_allclose(stats['beta_se'], expected['beta_se'], rtol=1e-10)
+    return beta
+
+
+def test_stage_one_matches_linregress(inputs):
+    beta = assert_parity(*inputs)
+    assert len(beta) == inputs[1].shape[1] - 1
+
+
+def test_stage_one_skips_asset_with_nan(inputs):
+    factor, df_assets, startIdx_asset, startIdx_risk_factor = inputs
+    df_assets = df_assets.copy()
+    nan_asset = df_assets.columns[4]
+    df_assets.loc[startIdx_asset + 10, nan_asset] = np.nan
+
+    beta = assert_parity(factor, df_assets, startIdx_asset, startIdx_risk_factor)
+    assert nan_asset not in beta.index
+    assert len(beta) == df_assets.shape[1] - 2
+
+
+@pytest.fixture(scope='module')
+def unbalanced(inputs):
+    """The test assets with scattered missing returns, one late-listed asset and one sparse year."""
+    factor, df_assets, startIdx_asset, startIdx_risk_factor = inputs
+    rng = np.random.default_rng(0)
+    df_assets = df_assets.copy()
+    values = df_assets.iloc[:, 1:].to_numpy()
+    values[rng.random(values.shape) < 0.1] = np.nan
+    # an asset listed only for the last 8 years
+    values[:-8, 2] = np.nan
+    # a year in which only three assets report
+    values[startIdx_asset + 20, 3:] = np.nan
+    df_assets.iloc[:, 1:] = values
+    return factor, df_assets, startIdx_asset, startIdx_risk_factor
+
+
+def masked_hac_se(x, y, alpha, beta, lags):
+    # direct sandwich (Z'Z)⁻¹ Ω (Z'Z)⁻¹ for one asset; the scores of missing periods are zero
+    present = ~np.isnan(y)
+    Z = np.column_stack((np.ones(len(x)), x)) * present[:, None]
+    scores = Z * np.where(present, y - alpha - beta * x, 0.0)[:, None]
+    omega = scores.T @ scores
+    for lag in range(1, lags + 1):
+        gamma = scores[:-lag].T @ scores[lag:]
+        omega += (1 - lag / (lags + 1)) * (gamma + gamma.T)
+    bread = np.linalg.inv(Z.T @ Z)
+    return np.sqrt(np.diag(bread @ omega @ bread))
+
+
+def test_masked_stage_one_matches_linregress_per_asset(unbalanced):
+    factor, df_assets, startIdx_asset, startIdx_risk_factor = unbalanced
+    x = factor.to_numpy()[startIdx_risk_factor:]
+    min_obs = 10
+    alpha, beta, stats = stage_one_fama_macbeth(factor, df_assets, startIdx_asset, startIdx_risk_factor,
+                                                return_stats=True, hac_lags=3, min_obs=min_obs)
+
+    # the late-listed asset falls below min_obs, every other asset is kept
+    assert df_assets.columns[3] not in beta.index
+    assert len(beta) == df_assets.shape[1] - 2
+    for name in beta.index:
+        y = df_assets[name].to_numpy()[startIdx_asset:]
+        present = ~np.isnan(y)
+        fit = linregress(x[present], y[present])
+        assert alpha[name] == pytest.approx(fit.intercept, rel=1e-10)
+        assert beta[name] == pytest.approx(fit.slope, rel=1e-10)
+        assert stats.at[name, 'alpha_se'] == pytest.approx(fit.intercept_stderr, rel=1e-10)
+        assert stats.at[name, 'beta_se'] == pytest.approx(fit.stderr, rel=1e-10)
+        np.testing.assert_allclose(stats.loc[name, ['alpha_hac_se', 'beta_hac_se']],
+                                   masked_hac_se(x, y, fit.intercept, fit.slope, 3), rtol=1e-8)
+
+    # the cut-off is inclusive
+    late = df_assets.columns[3]
+    n_late = int((~np.isnan(df_assets[late].to_numpy()[startIdx_asset:])).sum())
+    for threshold, kept in ((n_late, True), (n_late + 1, False)):
+        _, beta_cut = stage_one_fama_macbeth(factor, df_assets, startIdx_asset, startIdx_risk_factor,
+                                             min_obs=threshold)
+        assert (late in beta_cut.index) == kept
+
+
+def test_masked_stage_two_matches_linregress_per_period(unbalanced):
+    factor, df_assets, startIdx_asset, startIdx_risk_factor = unbalanced
+    _, betas = stage_one_fama_macbeth(factor, df_assets, startIdx_asset, startIdx_risk_factor, min_obs=10)
+    min_assets = 5
+    lambda_mean, lambda0_mean, stats = stage_two_fama_macbeth(df_assets, betas, return_stats=True,
+                                                              min_assets=min_assets)
+
+    R = df_assets[betas.index].to_numpy()
+    expected = {}
+    for period, returns in zip(df_assets.iloc[:, 0], R):
+        present = ~np.isnan(returns)
+        if present.sum() >= min_assets:
+            fit = linregress(betas.to_numpy()[present], returns[present])
+            expected[period] = (fit.intercept, fit.slope)
+    expected = pd.DataFrame.from_dict(expected, orient='index', columns=['lambda0', 'lambda'])
+
+    # the sparse year falls below min_assets
+    assert df_assets.iloc[startIdx_asset + 20, 0] not in stats['lambdas'].index
+    assert list(stats['lambdas'].index) == list(expected.index)
+    np.testing.assert_allclose(stats['lambdas'], expected, rtol=1e-8, atol=1e-12)
+    assert lambda_mean == pytest.approx(expected['lambda'].mean(), rel=1e-10)
+    assert lambda0_mean == pytest.approx(expected['lambda0'].mean(), rel=1e-10)
+
+    # the cut-off is inclusive
+    sparse_year = df_assets.iloc[startIdx_asset + 20, 0]
+    n_sparse = int((~np.isnan(R[startIdx_asset + 20])).sum())
+    assert 2 <= n_sparse < min_assets
+    for threshold, kept in ((n_sparse, True), (n_sparse + 1, False)):
+        _, _, stats_cut = stage_two_fama_macbeth(df_assets, betas, return_stats=True, min_assets=threshold)
+        assert (sparse_year in stats_cut['lambdas'].index) == kept
+
+
+def test_masked_modes_equal_balanced_modes_on_complete_panel(inputs):
+    factor, df_assets, startIdx_asset, startIdx_risk_factor = inputs
+    _, _, balanced = stage_one_fama_macbeth(factor, df_assets, startIdx_asset, startIdx_risk_factor,
+                                            return_stats=True)
+    _, betas, masked = stage_one_fama_macbeth(factor, df_assets, startIdx_asset, startIdx_risk_factor,
+                                              return_stats=True, min_obs=3)
+    np.testing.assert_allclose(masked, balanced, rtol=1e-10)
+
+    _, _, balanced = stage_two_fama_macbeth(df_assets, betas, return_stats=True)
+    _, _, masked = stage_two_fama_macbeth(df_assets, betas, return_stats=True, min_assets=2)
+    np.testing.assert_allclose(masked['lambdas'], balanced['lambdas'], rtol=1e-10, atol=1e-12)
+    assert masked['r2'] == pytest.approx(balanced['r2'], rel=1e-10)
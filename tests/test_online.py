@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+import main
+from scripts.data_loading import read_table
+from scripts.online import OnlineFamaMacBeth
+
+
+@pytest.fixture(scope='module')
+def tables():
+    """The input tables of data/ as validated frames, with missing returns in two assets."""
+    ctx = {'data_dir': 'data'}
+    tables = {name: read_table(path, name) for name, path in zip(main.INPUT_FILES, main.input_paths(ctx))}
+    df_assets = tables['test_assets']
+    # one asset misses a return in the history, another in one of the appended years
+    df_assets.iloc[30, 4] = np.nan
+    df_assets.iloc[-2, 9] = np.nan
+    return tables
+
+
+@pytest.mark.parametrize('k', [1, 3])
+def test_append_many_matches_full_recompute(tables, k):
+    last_years = tables['consumption']['year'].to_numpy()[-k:]
+    history = {name: df[~df['year'].isin(last_years)] for name, df in tables.items()}
+    new = {name: df[df['year'].isin(last_years)] for name, df in tables.items()}
+
+    model = OnlineFamaMacBeth(history['consumption'], history['population'], history['price_index'],
+                              history['test_assets'], main.omega)
+    appended = model.append_many(new['consumption'], new['population'], new['price_index'], new['test_assets'])
+    assert list(appended['year']) == list(last_years)
+
+    consistent, deviations = model.check_consistency(tables['consumption'], tables['population'],
+                                                     tables['price_index'], tables['test_assets'])
+    assert consistent, deviations
+    # both assets with a missing return are excluded from the prices of risk
+    _, betas = model.stage_one('unfiltered')
+    assert len(betas) == tables['test_assets'].shape[1] - 3
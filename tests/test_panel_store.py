@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.fama_macbeth import stage_one_fama_macbeth, stage_two_fama_macbeth
+from scripts.panel_store import (convert_csv_to_panel_store, stage_one_fama_macbeth_chunked,
+                                 stage_two_fama_macbeth_chunked)
+
+
+@pytest.fixture(scope='module')
+def store_inputs(load, df_solution, tmp_path_factory):
+    """A CSV of the test assets with missing returns, its PanelStore and the unfiltered growth factor."""
+    df_assets = pd.read_csv('data/test_assets.csv')
+    values = df_assets.iloc[:, 1:].to_numpy()
+    rng = np.random.default_rng(1)
+    # scattered gaps in a few assets, and an asset listed late
+    gappy = rng.choice(values.shape[1], 6, replace=False)
+    values[:, gappy] = np.where(rng.random((len(values), 6)) < 0.1, np.nan, values[:, gappy])
+    values[:40, 7] = np.nan
+    df_assets.iloc[:, 1:] = values
+
+    directory = tmp_path_factory.mktemp('panel')
+    csv_path = directory / 'returns.csv'
+    df_assets.to_csv(csv_path, index=False)
+    # row chunks of the conversion are shorter than T
+    store = convert_csv_to_panel_store(str(csv_path), str(directory / 'store'), chunksize=7)
+    factor = df_solution['unfiltered_growth_rate']
+    return csv_path, store, df_assets, factor, load.fama_macbeth_offsets(3)
+
+
+def test_to_frame_reproduces_csv(store_inputs):
+    csv_path, store, _, _, _ = store_inputs
+    pd.testing.assert_frame_equal(store.to_frame(), pd.read_csv(csv_path))
+
+
+@pytest.mark.parametrize('min_obs, min_assets', [(None, None), (10, 5)])
+def test_chunked_stages_match_in_memory(store_inputs, min_obs, min_assets):
+    _, store, df_assets, factor, offsets = store_inputs
+    # column chunks are smaller than N
+    alpha, beta = stage_one_fama_macbeth_chunked(factor, store, *offsets, chunk_size=4, min_obs=min_obs)
+    expected_alpha, expected_beta = stage_one_fama_macbeth(factor, df_assets, *offsets, min_obs=min_obs)
+    pd.testing.assert_series_equal(alpha, expected_alpha, rtol=1e-10)
+    pd.testing.assert_series_equal(beta, expected_beta, rtol=1e-10)
+    # balanced mode drops the assets with gaps, masked mode keeps them
+    assert (len(beta) < store.shape[1]) == (min_obs is None)
+
+    lambda_mean, lambda0_mean = stage_two_fama_macbeth_chunked(store, beta, chunk_size=4, min_assets=min_assets)
+    priced = df_assets[[df_assets.columns[0], *beta.index]]
+    expected_lambda, expected_lambda0 = stage_two_fama_macbeth(priced, beta, min_assets=min_assets)
+    assert lambda_mean == pytest.approx(expected_lambda, rel=1e-10)
+    assert lambda0_mean == pytest.approx(expected_lambda0, rel=1e-10)
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from scripts.fama_macbeth import stage_one_fama_macbeth, stage_two_fama_macbeth
+from scripts.pruning import MODES, prune_extremes, pruning_path
+
+
+@pytest.fixture(scope='module')
+def tied_inputs(load, df_solution):
+    """Unfiltered stage-one betas with ties at both extremes, and the test assets with a missing return."""
+    df_assets = load.test_assets.copy()
+    _, betas = stage_one_fama_macbeth(df_solution['unfiltered_growth_rate'], df_assets,
+                                      *load.fama_macbeth_offsets(3))
+    order = betas.sort_values().index
+    betas[order[1]] = betas[order[0]]
+    betas[order[-2]] = betas[order[-1]]
+    betas[order[len(order) // 2]] = betas[order[-1]]
+    # a missing return in an asset that survives the first pruning steps
+    df_assets.loc[10, order[len(order) // 2 - 1]] = np.nan
+    return betas, df_assets
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_pruning_path_matches_stage_two_on_pruned_table(tied_inputs, mode):
+    betas, df_assets = tied_inputs
+    # one-sided paths would end on the tied maxima, whose cross-section is singular
+    path = pruning_path(betas, df_assets, max_n=10, mode=mode)
+
+    removed = []
+    for n, row in path.iterrows():
+        removed += row['removed']
+        lambda_mean, lambda0_mean = stage_two_fama_macbeth(df_assets.drop(columns=removed), betas.drop(removed))
+        assert row['n_assets'] == len(betas) - len(removed)
+        assert row['lambda'] == pytest.approx(lambda_mean, rel=1e-9)
+        assert row['lambda0'] == pytest.approx(lambda0_mean, rel=1e-9)
+
+        # prune_extremes removes the same assets at the same depth
+        pruned_betas, pruned_assets = prune_extremes(betas, df_assets, n, mode)
+        assert set(pruned_betas.index) == set(betas.index) - set(removed)
+        assert list(pruned_assets.columns[1:]) == list(pruned_betas.index)
+
+
+def test_symmetric_pruning_removes_tied_extremes(tied_inputs):
+    betas, df_assets = tied_inputs
+    path = pruning_path(betas, df_assets, max_n=2)
+    dropped = [name for step in path['removed'] for name in step]
+    remaining = betas.drop(dropped)
+    # two steps remove both tied minima and two of the three tied maxima
+    assert remaining.min() > betas.min()
+    assert (remaining == betas.max()).sum() == 1
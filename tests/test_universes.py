@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from scripts.fama_macbeth import stage_one_fama_macbeth, stage_two_fama_macbeth
+from scripts.universes import RESULT_COLUMNS, evaluate_universes
+
+
+def test_disjoint_universe_does_not_abort_the_others(load, df_solution):
+    factors = df_solution.set_index('year')[['filtered_growth_rate', 'unfiltered_growth_rate']]
+    factors.columns = ['filtered', 'unfiltered']
+    disjoint = load.test_assets.copy()
+    disjoint['year'] -= 500
+
+    results = evaluate_universes(factors, {'disjoint': disjoint, 'reference': load.test_assets}, max_workers=1)
+
+    for branch in factors.columns:
+        row = results.loc[('disjoint', branch)]
+        assert row['n_periods'] == 0 and row['n_assets'] == 0
+        assert row[list(RESULT_COLUMNS)].isna().all()
+
+    # the overlapping universe is priced like main.py prices the test assets
+    for branch, column, first_factor_row in (('filtered', 'filtered_growth_rate', 1),
+                                             ('unfiltered', 'unfiltered_growth_rate', 3)):
+        _, betas = stage_one_fama_macbeth(df_solution[column], load.test_assets,
+                                          *load.fama_macbeth_offsets(first_factor_row))
+        lambda_mean, lambda0_mean = stage_two_fama_macbeth(load.test_assets, betas)
+        row = results.loc[('reference', branch)]
+        assert row['n_assets'] == len(betas)
+        assert row['lambda'] == pytest.approx(lambda_mean, rel=1e-10)
+        assert row['lambda0'] == pytest.approx(lambda0_mean, rel=1e-10)
+        assert np.isfinite(row[list(RESULT_COLUMNS)].to_numpy(dtype=float)).all()